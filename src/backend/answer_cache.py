@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+import numpy as np
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+# Cosine similarity between query embeddings above which a cached answer is
+# reused. Raw ModernBERT mean-pooled vectors are anisotropic (unrelated questions
+# often score > 0.95), so semantic matching is off (> 1) until calibrated on real
+# paraphrase / non-paraphrase pairs; only exact (normalized) repeats hit.
+DEFAULT_THRESHOLD = 1.01
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_TTL_SECONDS = 6 * 3600
+
+Entry = namedtuple("Entry", ["query", "query_vec", "chunk_key", "prompt_hash", "answer", "created_at"])
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form used for exact matches."""
+    return " ".join(query.lower().split())
+
+
+# ---------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------
+class AnswerCache:
+    """Reuse an LLM answer for a repeated (or, if enabled, semantically close) query.
+
+    A cached answer is served only when the retrieved chunk set and the prompt
+    hash are identical, so the LLM would have seen the same context, and the
+    normalized query text matches - or, with threshold <= 1, cosine(query,
+    cached query) >= threshold. Query vectors are assumed to be L2-normalized
+    (as embed_text returns them). Entries are tied to one index version;
+    set_index_version drops everything when the index changes.
+    max_entries=0 disables the cache.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, max_entries=DEFAULT_MAX_ENTRIES,
+                 ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.index_version = None
+        self._entries = OrderedDict()   # entry id -> Entry (LRU order)
+        self._by_chunks = {}            # chunk_key -> set of entry ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _chunk_key(chunk_ids):
+        return frozenset(int(cid) for cid in chunk_ids)
+
+    def set_index_version(self, version):
+        if version != self.index_version:
+            self.invalidate()
+            self.index_version = version
+
+    def invalidate(self):
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._by_chunks.clear()
+
+    def lookup(self, query, query_vec, chunk_ids, prompt_hash):
+        """Cached answer, or None."""
+        if not chunk_ids or self.max_entries <= 0:
+            return None
+        text = normalize_query(query)
+        key = self._chunk_key(chunk_ids)
+        now = time.time()
+        with self._lock:
+            candidates = []
+            for eid in list(self._by_chunks.get(key, ())):
+                entry = self._entries[eid]
+                if now - entry.created_at > self.ttl_seconds:
+                    self._drop(eid)
+                elif entry.prompt_hash == prompt_hash:
+                    candidates.append(eid)
+            exact = [eid for eid in candidates if self._entries[eid].query == text]
+            if exact:
+                eid = exact[-1]
+            elif query_vec is not None and self.threshold <= 1.0 and \
+                    any(self._entries[eid].query_vec is not None for eid in candidates):
+                candidates = [eid for eid in candidates if self._entries[eid].query_vec is not None]
+                q = np.asarray(query_vec, dtype="float32").reshape(-1)
+                sims = np.stack([self._entries[eid].query_vec for eid in candidates]) @ q
+                best = int(np.argmax(sims))
+                if sims[best] < self.threshold:
+                    self.misses += 1
+                    return None
+                eid = candidates[best]
+            else:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(eid)
+            self.hits += 1
+            return self._entries[eid].answer
+
+    def store(self, query, query_vec, chunk_ids, prompt_hash, answer):
+        if not chunk_ids or not answer or self.max_entries <= 0:
+            return
+        key = self._chunk_key(chunk_ids)
+        q = None if query_vec is None else np.array(query_vec, dtype="float32").reshape(-1)
+        with self._lock:
+            eid = self._next_id
+            self._next_id += 1
+            self._entries[eid] = Entry(normalize_query(query), q, key, prompt_hash, answer, time.time())
+            self._by_chunks.setdefault(key, set()).add(eid)
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, eid):
+        entry = self._entries.pop(eid)
+        ids = self._by_chunks[entry.chunk_key]
+        ids.discard(eid)
+        if not ids:
+            del self._by_chunks[entry.chunk_key]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
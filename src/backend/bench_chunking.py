@@ -0,0 +1,62 @@
+"""Throughput benchmark for chunking.chunk_document on large files.
+
+Concatenates docs/ until the text reaches --mb megabytes, then times the
+sentence-aware chunker (one tokenization with offsets, text sliced from the
+source) against the previous fixed-window approach (tokenize, cut 512-token
+windows, decode every window back to text).
+
+    python src/backend/bench_chunking.py --mb 1 10
+"""
+import argparse
+import time
+from pathlib import Path
+from transformers import AutoTokenizer
+import chunking
+
+DOCS_DIR = Path("docs")
+MODEL_NAME = "answerdotai/ModernBERT-base"
+
+
+def corpus(mb):
+    """docs/*.txt repeated until at least ``mb`` MB of text."""
+    texts = [p.read_text(encoding="utf-8") for p in sorted(DOCS_DIR.glob("*.txt"))]
+    base = "\n\n".join(texts)
+    target = int(mb * 1024 * 1024)
+    return (base + "\n\n") * (target // len(base.encode("utf-8")) + 1)
+
+
+def fixed_windows(text, tokenizer, chunk_size):
+    """The old generate_embeddings path: hard windows, text recovered by decoding."""
+    ids = tokenizer(text, truncation=False, padding=False)["input_ids"]
+    windows = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+    return [tokenizer.decode(w, skip_special_tokens=True) for w in windows]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunking throughput on large files")
+    parser.add_argument("--mb", type=float, nargs="+", default=[1, 10])
+    parser.add_argument("--chunk-size", type=int, default=chunking.DEFAULT_MAX_TOKENS)
+    parser.add_argument("--overlap", type=int, default=chunking.DEFAULT_OVERLAP)
+    parser.add_argument("--model", default=MODEL_NAME, help="tokenizer to chunk with")
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    print(f"{'MB':>6} {'method':<22} {'chunks':>7} {'s':>7} {'MB/s':>7} {'chunks/s':>9}")
+    for mb in args.mb:
+        text = corpus(mb)
+        size_mb = len(text.encode("utf-8")) / 2**20
+        windows, old_s = timed(fixed_windows, text, tokenizer, args.chunk_size)
+        chunks, new_s = timed(chunking.chunk_document, text, tokenizer, args.chunk_size, args.overlap)
+        for label, n, s in (("fixed windows + decode", len(windows), old_s),
+                            (f"sentences, overlap {args.overlap}", len(chunks), new_s)):
+            print(f"{size_mb:>6.1f} {label:<22} {n:>7} {s:>7.2f} {size_mb / s:>7.2f} {n / s:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
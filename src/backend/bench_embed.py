@@ -0,0 +1,139 @@
+"""Parity / latency check for the embedding backends in embed_backend.
+
+For every backend, re-embeds docs/ exactly the way generate_embeddings does
+and reports the cosine drift against fp32 torch vectors, then times
+single-query embedding (the bot's hot path) and reports the speed-up over
+fp32 torch. The reference is the store in embeddings/ when its manifest.json
+fingerprint is plain fp32 torch with the current chunk settings; otherwise
+(no manifest, --late-chunking, another backend or chunker) docs/ is
+re-embedded with fp32 torch, so chunking / pooling differences never show
+up as drift.
+
+    python src/backend/bench_embed.py --backends torch int8 onnx onnx-int8
+"""
+import argparse
+import time
+import numpy as np
+import torch
+import generate_embeddings as ge
+from ingest_pipeline import read_document
+import embed_backend
+import model_registry
+from embedding_store import EmbeddingStore, store_exists
+
+SAMPLE_QUERIES = [
+    "What are the symptoms of dyslexia?",
+    "How is dyspraxia diagnosed in adults?",
+    "What support is available at school for a child with dyslexia?",
+    "Can dyspraxia affect speech?",
+    "Who should I talk to if I think my child has a learning difficulty?",
+    "Is dyslexia linked to intelligence?",
+    "What treatments help with coordination problems?",
+    "How can employers make reasonable adjustments?",
+]
+
+
+# ---------------------------------------------------------------------
+# Measurements
+# ---------------------------------------------------------------------
+def embed_query(text, tokenizer, model):
+    """Same as rag_bot_v2._embed_text_uncached."""
+    with torch.no_grad():
+        inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512, padding=True)
+        outputs = model(**inputs)
+        emb = outputs.last_hidden_state.mean(dim=1)
+        emb = emb / emb.norm(dim=1, keepdim=True)
+    return emb.numpy().astype("float32")[0]
+
+
+def embed_chunks(docs, tokenizer, model):
+    """Chunk id -> embedding for ``docs`` [(name, text)], plus chunks/s."""
+    start = time.perf_counter()
+    vectors = {f"{name}_{cidx}": emb[0] for name, cidx, emb, _ in ge.embed_documents(docs, tokenizer, model)}
+    elapsed = time.perf_counter() - start
+    return vectors, len(vectors) / elapsed if elapsed else 0.0
+
+
+def chunk_drift(vectors, reference):
+    """Cosine between each re-embedded chunk and its fp32 reference vector."""
+    return np.array([float(vec @ reference[cid]) for cid, vec in vectors.items() if cid in reference])
+
+
+def stored_reference():
+    """Chunk id -> stored vector if embeddings/ is a plain fp32 torch build, else None."""
+    manifest = ge.load_manifest()
+    stored = manifest.get("fingerprint") if manifest else None
+    if stored != reference_fingerprint() or not store_exists(ge.EMB_DIR):
+        print(f"ℹ️ {ge.EMB_DIR} was built with {stored}, not {reference_fingerprint()}: "
+              f"drift is measured against a fresh fp32 torch re-embedding instead")
+        return None
+    store = EmbeddingStore.open(ge.EMB_DIR)
+    return {cid: np.asarray(store.vector(cid), dtype="float32") for cid in store.chunk_ids}
+
+
+def reference_fingerprint():
+    """generate_embeddings' fingerprint for fp32 torch, per-chunk pooling, current chunk settings."""
+    settings = ge.fingerprint()
+    settings.pop("backend", None)
+    settings.pop("pooling", None)
+    return settings
+
+
+def query_latencies_ms(queries, tokenizer, model, repeats):
+    embed_query(queries[0], tokenizer, model)  # first call pays for lazy init / graph optimization
+    times = []
+    for _ in range(repeats):
+        for q in queries:
+            start = time.perf_counter()
+            embed_query(q, tokenizer, model)
+            times.append((time.perf_counter() - start) * 1000.0)
+    return np.array(times)
+
+
+def run(backends, repeats):
+    reference = stored_reference()
+    docs = [(f.stem, read_document(f)) for f in ge.list_documents()]
+    print(f"{'backend':<10} {'chunks':>6} {'mean cos':>9} {'min cos':>8} {'query cos':>9} "
+          f"{'chunks/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'speed-up':>8}")
+
+    reference_queries = None
+    reference_p50 = None
+    for backend in backends:
+        tokenizer, model = model_registry.get_model(ge.MODEL_NAME, ge.DEVICE, backend)
+
+        vectors, chunks_per_s = embed_chunks(docs, tokenizer, model)
+        if reference is None:
+            # backends always starts with torch, the fp32 reference
+            reference = vectors
+        sims = chunk_drift(vectors, reference)
+        query_vecs = np.stack([embed_query(q, tokenizer, model) for q in SAMPLE_QUERIES])
+        if reference_queries is None:
+            # backends always starts with torch, the fp32 reference
+            reference_queries = query_vecs
+        query_cos = float(np.min(np.sum(query_vecs * reference_queries, axis=1)))
+
+        lat = query_latencies_ms(SAMPLE_QUERIES, tokenizer, model, repeats)
+        p50 = float(np.percentile(lat, 50))
+        if reference_p50 is None:
+            reference_p50 = p50
+        print(f"{backend:<10} {len(sims):>6} {sims.mean() if len(sims) else 0.0:>9.5f} "
+              f"{sims.min() if len(sims) else 0.0:>8.5f} {query_cos:>9.5f} {chunks_per_s:>9.1f} "
+              f"{p50:>8.2f} {np.percentile(lat, 99):>8.2f} {reference_p50 / p50:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backends: cosine drift vs fp32 torch vectors + latency")
+    parser.add_argument("--backends", nargs="+", default=list(embed_backend.BACKENDS),
+                        choices=embed_backend.BACKENDS)
+    parser.add_argument("--repeats", type=int, default=10, help="passes over the sample queries")
+    parser.add_argument("--threads", type=int, help="torch intra-op threads (default: torch's choice)")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    run(backends, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
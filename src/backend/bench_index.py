@@ -0,0 +1,101 @@
+"""Recall / latency benchmark for the index kinds in index_factory.
+
+Builds every index kind on synthetic, clustered, L2-normalized vectors and
+reports recall@k against the exact flat index plus p50/p99 single-query
+latency.
+
+    python src/backend/bench_index.py --sizes 10000 100000 1000000
+"""
+import argparse
+import time
+import numpy as np
+import index_factory
+
+
+# ---------------------------------------------------------------------
+# Data
+# ---------------------------------------------------------------------
+def synthetic_vectors(n, dim, n_clusters=256, seed=0):
+    """Gaussian blobs around random centres - closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((n_clusters, dim)).astype("float32")
+    labels = rng.integers(0, n_clusters, size=n)
+    x = centres[labels] + 0.6 * rng.standard_normal((n, dim)).astype("float32")
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    return x
+
+
+def synthetic_queries(base, n_queries, seed=1):
+    """Perturbed database vectors, so every query has real near neighbours."""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, base.shape[0], size=n_queries)
+    q = base[picks] + 0.05 * rng.standard_normal((n_queries, base.shape[1])).astype("float32")
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return np.ascontiguousarray(q)
+
+
+# ---------------------------------------------------------------------
+# Measurements
+# ---------------------------------------------------------------------
+def recall_at_k(found, truth):
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def query_latencies_ms(index, queries, k):
+    """One query at a time, the way the bot searches."""
+    times = []
+    for q in queries:
+        start = time.perf_counter()
+        index.search(q.reshape(1, -1), k)
+        times.append((time.perf_counter() - start) * 1000.0)
+    return np.array(times)
+
+
+def run(sizes, dim, k, n_queries, kinds, config):
+    print(f"{'n':>9} {'index':<28} {'build s':>8} {'recall@' + str(k):>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for n in sizes:
+        base = synthetic_vectors(n, dim)
+        queries = synthetic_queries(base, n_queries)
+        ids = np.arange(n, dtype="int64")
+
+        truth = None
+        for kind in kinds:
+            start = time.perf_counter()
+            index = index_factory.build_index(base, ids, dict(config, kind=kind))
+            build_s = time.perf_counter() - start
+
+            _, found = index.search(queries, k)
+            if truth is None:
+                # kinds always starts with flat, which is exact
+                truth = found
+            lat = query_latencies_ms(index, queries, k)
+            print(f"{n:>9} {index_factory.describe(index):<28} {build_s:>8.2f} "
+                  f"{recall_at_k(found, truth):>9.3f} {np.percentile(lat, 50):>8.3f} {np.percentile(lat, 99):>8.3f}")
+            del index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index kinds: recall@k vs flat + latency")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=768, help="ModernBERT-base hidden size")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--kinds", nargs="+", default=list(index_factory.INDEX_KINDS),
+                        choices=index_factory.INDEX_KINDS)
+    parser.add_argument("--nlist", type=int)
+    parser.add_argument("--nprobe", type=int)
+    parser.add_argument("--ef-search", type=int)
+    parser.add_argument("--pq-m", type=int)
+    args = parser.parse_args()
+
+    config = index_factory.load_config()
+    overrides = {"nlist": args.nlist, "nprobe": args.nprobe, "ef_search": args.ef_search, "pq_m": args.pq_m}
+    config.update({key: value for key, value in overrides.items() if value is not None})
+
+    kinds = ["flat"] + [kind for kind in args.kinds if kind != "flat"]
+    run(args.sizes, args.dim, args.k, args.queries, kinds, config)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Late chunking vs per-chunk encoding: ingestion time and retrieval recall.
+
+Embeds docs/ both ways - every chunk encoded on its own (the default), and
+late chunking (generate_embeddings --late-chunking: one long-context pass per
+document window, each chunk mean-pooled over its span) - and reports the time
+per mode plus recall@k of exact dense search over the resulting vectors.
+
+Queries are one sentence from the middle of every chunk (a hit is any chunk
+whose text contains it, or any chunk of the same document for doc recall),
+or real questions from --queries, a jsonl file of {"query": ..., "doc": ...}
+with doc the file stem; those only get doc recall. Synthetic queries quote
+the chunk they came from, which flatters per-chunk encoding - sentences that
+lean on earlier context ("It can also ...") are where late chunking helps.
+
+    python src/backend/bench_late_chunking.py --k 1 5 10
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+import numpy as np
+import torch
+import chunking
+import generate_embeddings as ge
+import model_registry
+from ingest_pipeline import read_document
+
+
+# ---------------------------------------------------------------------
+# Embedding, both ways
+# ---------------------------------------------------------------------
+def embed_per_chunk(docs, tokenizer, model, chunk_size, overlap):
+    chunks = [chunking.chunk_document(text, tokenizer, chunk_size, overlap) for _, text in docs]
+    windows = [c.input_ids for doc in chunks for c in doc]
+    return chunks, ge.embed_token_windows(windows, model, tokenizer.pad_token_id), len(windows)
+
+
+def embed_late(docs, tokenizer, model, chunk_size, overlap, window):
+    chunks, windows, spans = [], [], []
+    for _, text in docs:
+        doc_chunks, doc_windows, doc_spans = chunking.late_chunk_document(text, tokenizer, chunk_size,
+                                                                          overlap, window)
+        chunks.append(doc_chunks)
+        spans.extend((len(windows) + w, s, e) for w, s, e in doc_spans)
+        windows.extend(doc_windows)
+    return chunks, ge.embed_token_spans(windows, spans, model, tokenizer.pad_token_id), len(windows)
+
+
+def embed_queries(queries, tokenizer, model):
+    """Same pooling as the bot's query path (truncated to 512 tokens)."""
+    windows = tokenizer(queries, truncation=True, max_length=512)["input_ids"]
+    return ge.embed_token_windows(windows, model, tokenizer.pad_token_id)
+
+
+# ---------------------------------------------------------------------
+# Queries and recall
+# ---------------------------------------------------------------------
+def synthetic_queries(docs, chunks):
+    """(query, doc index, set of chunk texts that contain it) - a middle sentence per chunk."""
+    queries = []
+    for d, doc_chunks in enumerate(chunks):
+        for c in doc_chunks:
+            sentences = [s for s in chunking.chunk_text_by_sentences(c.text) if len(s.split()) >= 5]
+            if len(sentences) < 3:
+                continue
+            query = sentences[len(sentences) // 2]
+            queries.append((query, d, {o.text for o in doc_chunks if query in o.text}))
+    return queries
+
+
+def load_queries(path, docs):
+    names = {name: d for d, (name, _) in enumerate(docs)}
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                queries.append((row["query"], names[row["doc"]], None))
+    return queries
+
+
+def recall(query_vecs, queries, chunks, vectors, ks):
+    """{k: (chunk recall or None, doc recall)} of exact inner-product search."""
+    flat = [(d, c.text) for d, doc_chunks in enumerate(chunks) for c in doc_chunks]
+    order = np.argsort(-(query_vecs @ vectors.T), axis=1)
+    out = {}
+    for k in ks:
+        chunk_hits = doc_hits = 0
+        for (_, doc, relevant), top in zip(queries, order[:, :k]):
+            doc_hits += any(flat[i][0] == doc for i in top)
+            chunk_hits += relevant is not None and any(flat[i][1] in relevant for i in top)
+        has_chunks = queries[0][2] is not None
+        out[k] = (chunk_hits / len(queries) if has_chunks else None, doc_hits / len(queries))
+    return out
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Late chunking vs per-chunk encoding: time and recall@k")
+    parser.add_argument("--docs", default=str(ge.DOCS_DIR), help="directory of .txt / .docx documents")
+    parser.add_argument("--model", default=ge.MODEL_NAME)
+    parser.add_argument("--chunk-size", type=int, default=ge.CHUNK_SIZE)
+    parser.add_argument("--overlap", type=int, default=ge.CHUNK_OVERLAP)
+    parser.add_argument("--window", type=int, default=chunking.LATE_WINDOW_TOKENS,
+                        help="late chunking tokens per pass (capped at the model's max length)")
+    parser.add_argument("--queries", help="jsonl of {\"query\", \"doc\"} (default: a sentence from every chunk)")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--threads", type=int, help="torch intra-op threads (default: torch's choice)")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    files = sorted(p for p in Path(args.docs).iterdir() if p.suffix in (".txt", ".docx"))
+    docs = [(f.stem, read_document(f)) for f in files]
+    tokenizer, model = model_registry.get_model(args.model, ge.DEVICE, "torch")
+    embed_per_chunk(docs[:1], tokenizer, model, args.chunk_size, args.overlap)  # warm-up
+
+    (chunks, base_vecs, base_passes), base_s = timed(embed_per_chunk, docs, tokenizer, model,
+                                                     args.chunk_size, args.overlap)
+    (late_chunks, late_vecs, late_passes), late_s = timed(embed_late, docs, tokenizer, model,
+                                                          args.chunk_size, args.overlap, args.window)
+    assert [[c.text for c in d] for d in chunks] == [[c.text for c in d] for d in late_chunks]
+
+    queries = load_queries(args.queries, docs) if args.queries else synthetic_queries(docs, chunks)
+    query_vecs = embed_queries([q for q, _, _ in queries], tokenizer, model)
+    n_chunks = len(base_vecs)
+    print(f"{len(docs)} docs, {n_chunks} chunks, {len(queries)} queries"
+          f"{'' if args.queries else ' (synthetic)'}\n")
+
+    header = f"{'mode':<10} {'passes':>6} {'s':>7} {'chunks/s':>9}"
+    for k in args.k:
+        header += f" {f'chunk@{k}':>8} {f'doc@{k}':>7}"
+    print(header)
+    for label, vecs, passes, s in (("per-chunk", base_vecs, base_passes, base_s),
+                                   ("late", late_vecs, late_passes, late_s)):
+        line = f"{label:<10} {passes:>6} {s:>7.2f} {n_chunks / s:>9.1f}"
+        for k, (chunk_r, doc_r) in recall(query_vecs, queries, chunks, vecs, args.k).items():
+            line += f" {'-' if chunk_r is None else f'{chunk_r:.3f}':>8} {doc_r:>7.3f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import json
+import mmap
+from collections import namedtuple
+from pathlib import Path
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+# All chunk texts concatenated into one UTF-8 blob, plus a JSON table with,
+# per row: FAISS id, chunk id, source document and byte offset into the blob.
+EMB_DIR = Path("embeddings")
+BLOB_NAME = "chunks.bin"
+META_NAME = "chunks_meta.json"
+
+Chunk = namedtuple("Chunk", ["chunk_id", "doc", "text"])
+
+
+# ---------------------------------------------------------------------
+# Store
+# ---------------------------------------------------------------------
+class ChunkStore:
+    """FAISS id -> Chunk(chunk_id, doc, text), loaded once and looked up in memory."""
+
+    def __init__(self, blob, offsets, faiss_ids, chunk_ids, docs):
+        self._blob = blob
+        self._offsets = offsets
+        self.faiss_ids = [int(fid) for fid in faiss_ids]
+        self.chunk_ids = list(chunk_ids)
+        self.docs = list(docs)
+        self._row_of_id = {fid: i for i, fid in enumerate(self.faiss_ids)}
+
+    @classmethod
+    def open(cls, emb_dir=EMB_DIR, use_mmap=False):
+        """Read the blob into RAM, or mmap it (use_mmap=True) for large corpora."""
+        emb_dir = Path(emb_dir)
+        meta = json.loads((emb_dir / META_NAME).read_text(encoding="utf-8"))
+        blob_path = emb_dir / BLOB_NAME
+        if use_mmap and blob_path.stat().st_size > 0:
+            with open(blob_path, "rb") as f:
+                blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            blob = blob_path.read_bytes()
+        return cls(blob, meta["offsets"], meta["faiss_ids"], meta["chunk_ids"], meta["docs"])
+
+    def __len__(self):
+        return len(self.faiss_ids)
+
+    def __contains__(self, faiss_id):
+        return int(faiss_id) in self._row_of_id
+
+    def _row(self, row):
+        start, end = self._offsets[row], self._offsets[row + 1]
+        text = self._blob[start:end].decode("utf-8")
+        return Chunk(self.chunk_ids[row], self.docs[row], text)
+
+    def get(self, faiss_id):
+        """Chunk for a FAISS id, or None if the id is unknown."""
+        row = self._row_of_id.get(int(faiss_id))
+        return None if row is None else self._row(row)
+
+    def items(self):
+        """Yield (faiss_id, Chunk) in store order."""
+        for row, fid in enumerate(self.faiss_ids):
+            yield fid, self._row(row)
+
+
+def chunk_store_exists(emb_dir=EMB_DIR):
+    emb_dir = Path(emb_dir)
+    return (emb_dir / META_NAME).exists() and (emb_dir / BLOB_NAME).exists()
+
+
+def write_chunk_store(faiss_ids, chunk_ids, docs, texts, emb_dir=EMB_DIR):
+    """Write blob + table; temp files are renamed into place so readers never see half a store."""
+    emb_dir = Path(emb_dir)
+    emb_dir.mkdir(exist_ok=True)
+
+    if not (len(faiss_ids) == len(chunk_ids) == len(docs) == len(texts)):
+        raise ValueError("❌ faiss_ids, chunk_ids, docs and texts must line up")
+
+    blob_tmp = emb_dir / (BLOB_NAME + ".tmp")
+    meta_tmp = emb_dir / (META_NAME + ".tmp")
+    offsets = [0]
+    with open(blob_tmp, "wb") as f:
+        for text in texts:
+            data = text.encode("utf-8")
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+
+    meta = {
+        "faiss_ids": [int(fid) for fid in faiss_ids],
+        "chunk_ids": list(chunk_ids),
+        "docs": list(docs),
+        "offsets": offsets,
+    }
+    meta_tmp.write_text(json.dumps(meta), encoding="utf-8")
+    blob_tmp.replace(emb_dir / BLOB_NAME)
+    meta_tmp.replace(emb_dir / META_NAME)
+
+
+# ---------------------------------------------------------------------
+# Legacy layout (one chunks/<chunk_id>.txt per chunk)
+# ---------------------------------------------------------------------
+def migrate_legacy(emb_dir=EMB_DIR, chunks_dir=Path("chunks")):
+    """Build the chunk store from chunks/*.txt, using the ids in the embedding store."""
+    from embedding_store import EmbeddingStore
+
+    store = EmbeddingStore.open(emb_dir)
+    texts = [(Path(chunks_dir) / f"{cid}.txt").read_text(encoding="utf-8") for cid in store.chunk_ids]
+    docs = [cid.rsplit("_", 1)[0] for cid in store.chunk_ids]
+    write_chunk_store(store.faiss_ids, store.chunk_ids, docs, texts, emb_dir)
+    print(f"✅ Migrated {len(texts)} chunks → {Path(emb_dir) / BLOB_NAME}")
+
+
+if __name__ == "__main__":
+    migrate_legacy()
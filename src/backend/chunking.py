@@ -7,11 +7,34 @@ Original file is located at
     https://colab.research.google.com/drive/1f-MZsCeYd_t5ZzkYTinyVRaZcP-0flI9
 """
 
-pip install python-docx
+# Requires: pip install python-docx (only for .docx input)
 
+import json
 import re
 import sys
-from docx import Document
+from bisect import bisect_right
+from collections import namedtuple
+from itertools import chain, islice
+
+# Same as the pattern in chunk_text_by_sentences, minus the end-of-text case
+# (only the final flush knows where the text ends)
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+(?=[A-Z])')
+
+READ_BUFFER_CHARS = 1 << 20      # characters per buffered read of a .txt file
+MAX_SENTENCE_CHARS = 1 << 20     # a "sentence" longer than this is emitted as is, to bound memory
+
+# Sentence ends (as in chunk_text_by_sentences) plus line breaks, so headings
+# and list items without a full stop still end a sentence
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+(?=[A-Z])|\s*\n\s*')
+
+DEFAULT_MAX_TOKENS = 512   # per chunk, including the model's [CLS] / [SEP]
+DEFAULT_OVERLAP = 64       # tokens of trailing sentences repeated at the start of the next chunk
+LATE_WINDOW_TOKENS = 8192  # late chunking: tokens per long-context pass, including [CLS] / [SEP]
+
+# text is source[start:end] - sliced, never re-decoded from token ids;
+# token_start / token_end locate input_ids (minus [CLS] / [SEP]) in the document's ids
+TextChunk = namedtuple("TextChunk", ["text", "start", "end", "input_ids", "token_start", "token_end"])
+
 
 def chunk_text_by_sentences(text):
     """
@@ -30,22 +53,235 @@ def chunk_text_by_sentences(text):
     return sentences
 
 
+def sentence_spans(text):
+    """
+    (start, end) character offsets of each sentence in text, with the
+    surrounding whitespace trimmed off.
+    """
+    spans = []
+    prev = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        _add_span(spans, text, prev, match.start())
+        prev = match.end()
+    _add_span(spans, text, prev, len(text))
+    return spans
+
+
+def _add_span(spans, text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start < end:
+        spans.append((start, end))
+
+
+def pack_sentences(sizes, budget, overlap):
+    """
+    Greedily pack consecutive sentences (given their token counts) into
+    groups of at most budget tokens. Each group after the first starts with
+    the trailing sentences of the previous one, up to overlap tokens.
+
+    Returns (first, last_exclusive) sentence index pairs; a sentence longer
+    than budget comes back alone and is split by the caller.
+    """
+    groups = []
+    i, n = 0, len(sizes)
+    while i < n:
+        j, total = i, 0
+        while j < n and total + sizes[j] <= budget:
+            total += sizes[j]
+            j += 1
+        if j == i:
+            j = i + 1  # oversized sentence
+        groups.append((i, j))
+        if j >= n:
+            break
+        # step back over whole sentences for the overlap, but always move forward
+        k, back = j, 0
+        while k - 1 > i and back + sizes[k - 1] <= overlap:
+            back += sizes[k - 1]
+            k -= 1
+        i = k
+    return groups
+
+
+def tokenize_document(text, tokenizer):
+    """Whole-document ids + character offsets, no special tokens (needs a fast tokenizer)."""
+    return tokenizer(text, add_special_tokens=False, return_offsets_mapping=True,
+                     truncation=False, padding=False)
+
+
+def special_tokens(tokenizer):
+    """([CLS], [SEP]) id lists wrapped around every model input (empty where the model has none)."""
+    prefix = [tokenizer.cls_token_id] if tokenizer.cls_token_id is not None else []
+    suffix = [tokenizer.sep_token_id] if tokenizer.sep_token_id is not None else []
+    return prefix, suffix
+
+
+def chunk_document(text, tokenizer, max_tokens=DEFAULT_MAX_TOKENS, overlap=DEFAULT_OVERLAP, encoding=None):
+    """
+    Split text into sentence-aligned chunks of at most max_tokens tokens,
+    overlapping by up to overlap tokens.
+
+    The text is tokenized once (a fast tokenizer is needed for the character
+    offsets); each chunk's input_ids are its slice of those ids wrapped in the
+    model's special tokens, and its text is the matching slice of the source.
+    Sentences longer than a chunk fall back to fixed windows with the same overlap.
+    Pass ``encoding`` (from tokenize_document) when the caller needs the ids too.
+    """
+    if encoding is None:
+        encoding = tokenize_document(text, tokenizer)
+    ids = encoding["input_ids"]
+    offsets = encoding["offset_mapping"]
+    if not ids:
+        return []
+
+    prefix, suffix = special_tokens(tokenizer)
+    budget = max(1, max_tokens - len(prefix) - len(suffix))
+    overlap = min(overlap, budget - 1)
+
+    # Token range of every sentence: from the first token reaching into it
+    # (BPE tokens carry the preceding space) up to the next sentence's first token
+    token_ends = [end for _, end in offsets]
+    spans = sentence_spans(text)
+    if not spans:
+        return []  # whitespace only - BPE tokenizers still emit ids for it
+    firsts = [bisect_right(token_ends, start) for start, _ in spans]
+    firsts[0] = 0
+    bounds = list(zip(firsts, firsts[1:] + [len(ids)]))
+    sizes = [last - first for first, last in bounds]
+
+    def make(tok_start, tok_end):
+        start = offsets[tok_start][0]
+        end = max(offsets[tok_end - 1][1], start)
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return TextChunk(text[start:end], start, end, prefix + ids[tok_start:tok_end] + suffix, tok_start, tok_end)
+
+    chunks = []
+    for first, last in pack_sentences(sizes, budget, overlap):
+        tok_start, tok_end = bounds[first][0], bounds[last - 1][1]
+        if tok_end - tok_start <= budget:
+            chunks.append(make(tok_start, tok_end))
+            continue
+        # one sentence over budget: fixed windows inside it
+        stride = budget - overlap
+        for w in range(tok_start, tok_end, stride):
+            chunks.append(make(w, min(w + budget, tok_end)))
+            if w + budget >= tok_end:
+                break
+    return [c for c in chunks if c.text]
+
+
+def late_windows(n_tokens, chunks, window=LATE_WINDOW_TOKENS, n_special=2):
+    """Long windows over a document's tokens for late chunking, and the one each chunk is pooled in.
+
+    Windows advance by (window - longest chunk), so every chunk lies wholly in
+    at least one; of those it takes the window where it has the most context on
+    its nearer side. Returns ([(tok_start, tok_end)] per window, [(window, start,
+    end)] per chunk, positions relative to the window's first content token).
+    """
+    budget = window - n_special
+    longest = max(c.token_end - c.token_start for c in chunks)
+    if longest > budget:
+        raise ValueError(f"late chunking window of {window} tokens cannot hold a {longest}-token chunk")
+    stride = max(1, budget - longest)
+    n_windows = 1 + max(0, -(-(n_tokens - budget) // stride))
+    bounds = [(i * stride, min(i * stride + budget, n_tokens)) for i in range(n_windows)]
+
+    spans = []
+    for c in chunks:
+        # windows i with i * stride <= token_start and i * stride + budget >= token_end
+        first = max(0, -(-(c.token_end - budget) // stride))
+        last = min(n_windows - 1, c.token_start // stride)
+        best = max(range(first, last + 1),
+                   key=lambda i: min(c.token_start - bounds[i][0], bounds[i][1] - c.token_end))
+        spans.append((best, c.token_start - bounds[best][0], c.token_end - bounds[best][0]))
+    return bounds, spans
+
+
+def late_chunk_document(text, tokenizer, max_tokens=DEFAULT_MAX_TOKENS, overlap=DEFAULT_OVERLAP,
+                        window=LATE_WINDOW_TOKENS):
+    """chunk_document() plus the long-context windows to encode for late chunking.
+
+    Returns (chunks, windows, spans): windows are input ids wrapped in the
+    special tokens; spans[i] = (window, start, end) are the positions of chunk
+    i's tokens in that window's input ids, to mean-pool its hidden states over.
+    Windows never exceed the tokenizer's model_max_length.
+    """
+    window = min(window, tokenizer.model_max_length)
+    encoding = tokenize_document(text, tokenizer)
+    chunks = chunk_document(text, tokenizer, max_tokens, overlap, encoding=encoding)
+    if not chunks:
+        return [], [], []
+    ids = encoding["input_ids"]
+    prefix, suffix = special_tokens(tokenizer)
+    bounds, spans = late_windows(len(ids), chunks, window, len(prefix) + len(suffix))
+    windows = [prefix + ids[start:end] + suffix for start, end in bounds]
+    spans = [(w, start + len(prefix), end + len(prefix)) for w, start, end in spans]
+    return chunks, windows, spans
+
+
+def iter_text_blocks(file_path):
+    """
+    Yields the text of a .txt file in READ_BUFFER_CHARS reads, or a .docx
+    file one paragraph at a time, without holding the whole text.
+    """
+    if file_path.endswith('.docx'):
+        from docx import Document
+        for paragraph in Document(file_path).paragraphs:
+            yield paragraph.text + '\n'
+    else:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            while True:
+                block = file.read(READ_BUFFER_CHARS)
+                if not block:
+                    break
+                yield block
+
+
+def iter_sentences(blocks):
+    """
+    Yields the same sentences as chunk_text_by_sentences(''.join(blocks)),
+    as soon as each one is complete.
+
+    The text after the last sentence end seen so far is carried into the next
+    block, so a boundary straddling two blocks is still found; each block is
+    only scanned from the end of the carried text's last word.
+    """
+    carry = ''
+    for block in blocks:
+        scan_from = len(carry.rstrip())
+        carry += block
+        start = 0
+        for match in SENTENCE_END.finditer(carry, scan_from):
+            sentence = carry[start:match.start()].strip()
+            if sentence:
+                yield sentence
+            start = match.end()
+        carry = carry[start:]
+        if len(carry) > MAX_SENTENCE_CHARS:
+            yield carry.strip()
+            carry = ''
+    yield from chunk_text_by_sentences(carry)
+
+
+def stream_file(file_path):
+    """
+    Generator over the sentences of a .docx or .txt file, read incrementally.
+    """
+    return iter_sentences(iter_text_blocks(file_path))
+
+
 def chunk_file(file_path):
     """
     Reads a .docx or .txt file and chunks it into sentences.
     """
     try:
-        if file_path.endswith('.docx'):
-            # Read from .docx file
-            doc = Document(file_path)
-            text = '\n'.join([paragraph.text for paragraph in doc.paragraphs])
-        else:
-            # Read from .txt file
-            with open(file_path, 'r', encoding='utf-8') as file:
-                text = file.read()
-
-        sentences = chunk_text_by_sentences(text)
-        return sentences
+        return list(stream_file(file_path))
 
     except FileNotFoundError:
         print(f"Error: File '{file_path}' not found.")
@@ -57,19 +293,19 @@ def chunk_file(file_path):
 
 def save_chunks(sentences, output_file):
     """
-    Saves chunked sentences to an output file as a Python list.
+    Streams sentences (any iterable) to output_file as JSON lines:
+    {"id": 0, "text": "..."} per sentence. Returns the number written.
     """
+    count = 0
     try:
         with open(output_file, 'w', encoding='utf-8') as file:
-            file.write("chunks = [\n")
-            for sentence in sentences:
-                # Escape quotes in sentences
-                escaped_sentence = sentence.replace('"', '\\"')
-                file.write(f'    "{escaped_sentence}",\n')
-            file.write("]\n")
-        print(f"Successfully saved {len(sentences)} sentences to '{output_file}'")
+            for count, sentence in enumerate(sentences, 1):
+                file.write(json.dumps({"id": count - 1, "text": sentence}, ensure_ascii=False))
+                file.write('\n')
+        print(f"Successfully saved {count} sentences to '{output_file}'")
     except Exception as e:
         print(f"Error saving file: {e}")
+    return count
 
 
 def print_chunks(sentences, max_display=None):
@@ -86,20 +322,24 @@ def print_chunks(sentences, max_display=None):
 
 # Main execution
 if __name__ == "__main__":
-    # Example usage
-    input_file = "input.docx"  # Change this to your .docx or .txt file path
-    output_file = "output_chunks.txt"  # Output file name
+    # Example usage: python chunking.py [input.docx|input.txt] [output.jsonl]
+    input_file = sys.argv[1] if len(sys.argv) > 1 else "input.docx"
+    output_file = sys.argv[2] if len(sys.argv) > 2 else "output_chunks.jsonl"
 
     print(f"Reading from: {input_file}")
-    sentences = chunk_file(input_file)
+    try:
+        sentences = stream_file(input_file)
+        first = list(islice(sentences, 5))
+    except FileNotFoundError:
+        print(f"Error: File '{input_file}' not found.")
+        first, sentences = [], iter(())
 
-    if sentences:
-        print(f"\nTotal sentences found: {len(sentences)}\n")
+    if first:
         print("First 5 sentences:")
-        print_chunks(sentences, max_display=5)
+        print_chunks(first)
 
-        # Save to output file
-        save_chunks(sentences, output_file)
+        # Save to output file, streaming the rest of the file through
+        total = save_chunks(chain(first, sentences), output_file)
+        print(f"\nTotal sentences found: {total}")
     else:
         print("No sentences found or file could not be read.")
-
@@ -0,0 +1,141 @@
+import os
+from collections import namedtuple
+from pathlib import Path
+import numpy as np
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+# torch      - fp32 eager PyTorch (reference; what embeddings/ was built with)
+# int8       - torch with every nn.Linear dynamically quantized to int8
+# onnx       - fp32 ONNX Runtime session, exported from the torch model once
+# onnx-int8  - the ONNX export with int8 dynamically quantized weights
+BACKENDS = ("torch", "int8", "onnx", "onnx-int8")
+DEFAULT_BACKEND = os.environ.get("EMBED_BACKEND", "torch")
+ONNX_DIR = Path("models")
+ONNX_OPSET = 17
+
+# Same shape as a transformers model output, so pooling code works unchanged
+EncoderOutput = namedtuple("EncoderOutput", ["last_hidden_state"])
+
+
+def cache_fingerprint(model_name, backend):
+    """Key for caches of vectors: non-fp32 backends produce (slightly) different vectors."""
+    return model_name if backend == "torch" else f"{model_name}:{backend}"
+
+
+# ---------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------
+def load_torch(model_name, device):
+    # transformers is imported here, not at module import - it alone takes seconds
+    from transformers import AutoTokenizer, AutoModel
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).to(device)
+    model.eval()
+    return tokenizer, model
+
+
+def quantize_int8(model):
+    """Dynamic int8 quantization of the Linear layers (weights int8, activations quantized per batch)."""
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def onnx_path(model_name, quantized=False):
+    stem = model_name.strip("/").replace("/", "__")
+    return ONNX_DIR / f"{stem}{'.int8' if quantized else ''}.onnx"
+
+
+def export_onnx(model, tokenizer, path):
+    """Export ``model`` to ONNX with dynamic batch / sequence axes."""
+    import torch
+    path.parent.mkdir(parents=True, exist_ok=True)
+    sample = tokenizer(["export sample", "a second, longer export sample"], return_tensors="pt", padding=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            str(tmp_path),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=ONNX_OPSET,
+            dynamo=False,
+        )
+    tmp_path.replace(path)
+    print(f"💾 Exported ONNX model → {path}")
+
+
+def quantize_onnx(src, dst):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    tmp_path = dst.with_name(dst.name + ".tmp")
+    quantize_dynamic(str(src), str(tmp_path), weight_type=QuantType.QInt8)
+    tmp_path.replace(dst)
+    print(f"💾 Quantized ONNX model → {dst}")
+
+
+class OnnxEncoder:
+    """ONNX Runtime session behind the ``model(**inputs).last_hidden_state`` interface."""
+
+    def __init__(self, path, config, threads=None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.config = config
+        self.path = path
+
+    def __call__(self, input_ids, attention_mask, **_):
+        import torch
+        feeds = {
+            "input_ids": np.asarray(input_ids, dtype="int64"),
+            "attention_mask": np.asarray(attention_mask, dtype="int64"),
+        }
+        hidden = self.session.run(["last_hidden_state"], feeds)[0]
+        return EncoderOutput(torch.from_numpy(hidden))
+
+    def eval(self):
+        return self
+
+
+def load_onnx(model_name, device, quantized=False):
+    if device != "cpu":
+        raise ValueError("ONNX backends run on CPU only")
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        raise ImportError("ONNX backends need onnxruntime: pip install onnxruntime onnx")
+
+    tokenizer, model = load_torch(model_name, device)
+    fp32_path = onnx_path(model_name)
+    if not fp32_path.exists():
+        export_onnx(model, tokenizer, fp32_path)
+    path = fp32_path
+    if quantized:
+        path = onnx_path(model_name, quantized=True)
+        if not path.exists():
+            quantize_onnx(fp32_path, path)
+    # the torch weights are dropped here, only the config is kept
+    return tokenizer, OnnxEncoder(path, model.config)
+
+
+def load(model_name, device="cpu", backend=DEFAULT_BACKEND):
+    """(tokenizer, model) where ``model(input_ids=..., attention_mask=...)`` has .last_hidden_state."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {BACKENDS}")
+    print(f"📌 Loading {model_name} ({device}, {backend})...")
+    if backend == "torch":
+        return load_torch(model_name, device)
+    if backend == "int8":
+        tokenizer, model = load_torch(model_name, device)
+        return tokenizer, quantize_int8(model)
+    return load_onnx(model_name, device, quantized=backend == "onnx-int8")
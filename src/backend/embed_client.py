@@ -0,0 +1,87 @@
+import http.client
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+import numpy as np
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+# Set EMBED_SERVER=http://127.0.0.1:8765 (or pass --embed-server) to embed
+# through embed_server.py instead of loading a model into this process.
+EMBED_SERVER = os.environ.get("EMBED_SERVER")
+TIMEOUT_S = 300.0          # ingestion batches can take a while on CPU
+RETRIES = 8                # 503 (server busy) / connection retries, with backoff
+BACKOFF_S = 0.05
+
+
+class EmbedServerError(RuntimeError):
+    pass
+
+
+class EmbedClient:
+    """Thin client for embed_server.py; one keep-alive connection per calling thread."""
+
+    def __init__(self, url, timeout=TIMEOUT_S, retries=RETRIES):
+        parts = urlsplit(url if "://" in url else f"http://{url}")
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.retries = retries
+        self._local = threading.local()
+
+    def _connection(self, fresh=False):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or fresh:
+            if conn is not None:
+                conn.close()
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, method, path, body=None):
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+        delay = BACKOFF_S
+        for attempt in range(self.retries + 1):
+            try:
+                conn = self._connection(fresh=attempt > 0)
+                conn.request(method, path, body=payload, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (ConnectionError, http.client.HTTPException, OSError):
+                if attempt == self.retries:
+                    raise
+            else:
+                if resp.status != 503:
+                    return resp, data
+                delay = max(delay, float(resp.getheader("Retry-After", 0)) / 4)
+            time.sleep(delay)
+            delay = min(delay * 2, 2.0)
+        raise EmbedServerError(f"{self.url} still overloaded after {self.retries} retries")
+
+    def embed(self, model, texts=None, input_ids=None, kind="hf", backend=None, max_length=None):
+        """(n, dim) float32 L2-normalized rows for ``texts`` (or pre-tokenized ``input_ids``)."""
+        body = {"model": model, "kind": kind, "backend": backend, "max_length": max_length}
+        if input_ids is not None:
+            body["input_ids"] = [[int(t) for t in ids] for ids in input_ids]
+        else:
+            body["texts"] = list(texts)
+        resp, data = self._request("POST", "/embed", body)
+        if resp.status != 200:
+            raise EmbedServerError(f"{resp.status}: {data.decode('utf-8', 'replace')}")
+        rows, dim = int(resp.getheader("X-Rows")), int(resp.getheader("X-Dim"))
+        return np.frombuffer(data, dtype="float32").reshape(rows, dim).copy()
+
+    def health(self):
+        resp, data = self._request("GET", "/health")
+        return json.loads(data)
+
+
+def client_for(url):
+    """EmbedClient for ``url`` (default: $EMBED_SERVER), or None to embed in-process."""
+    url = url or EMBED_SERVER
+    return EmbedClient(url) if url else None
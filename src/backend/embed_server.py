@@ -0,0 +1,213 @@
+import argparse
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import model_registry
+import embed_backend
+import tracing
+from micro_batcher import MicroBatcher
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+# One process per host holds the embedding models; ingestion, the bot (and its
+# workers), mock and scoring send it text or token ids over localhost HTTP
+# (embed_client.py). Requests for the same model are micro-batched together.
+HOST = "127.0.0.1"
+PORT = 8765
+DEVICE = "cpu"
+# kind:name - "hf" encoders are masked-mean pooled, "st" are sentence-transformers
+DEFAULT_MODELS = ("hf:answerdotai/ModernBERT-base", "st:all-MiniLM-L6-v2")
+MAX_BATCH_REQUESTS = 32    # requests merged into one batch
+MAX_WAIT_MS = 2.0          # how long a request waits for others to share its batch
+MAX_QUEUED_ROWS = 4096     # texts / windows accepted but not yet embedded; past it clients get 503
+ST_BATCH_SIZE = 64
+
+
+class Overloaded(Exception):
+    pass
+
+
+class EmbedService:
+    """Allowed models, one MicroBatcher each (per backend / max_length), and the backpressure count."""
+
+    def __init__(self, models=DEFAULT_MODELS, max_queued_rows=MAX_QUEUED_ROWS,
+                 max_batch=MAX_BATCH_REQUESTS, max_wait_ms=MAX_WAIT_MS):
+        self.models = set(models)
+        self.max_queued_rows = max_queued_rows
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self._batchers = {}
+        self._lock = threading.Lock()
+        self.queued_rows = 0
+        self.rejected = 0
+
+    def _batcher(self, key):
+        with self._lock:
+            batcher = self._batchers.get(key)
+            if batcher is None:
+                batcher = MicroBatcher(lambda requests: self._run(key, requests), name="embed",
+                                       max_batch_size=self.max_batch, max_wait_ms=self.max_wait_ms)
+                self._batchers[key] = batcher
+            return batcher
+
+    def submit(self, key, rows, n_rows):
+        """Future of the (n_rows, dim) matrix for ``rows``; raises Overloaded past MAX_QUEUED_ROWS."""
+        with self._lock:
+            if self.queued_rows and self.queued_rows + n_rows > self.max_queued_rows:
+                self.rejected += 1
+                raise Overloaded(f"{self.queued_rows} rows queued")
+            self.queued_rows += n_rows
+
+        def release(_):
+            with self._lock:
+                self.queued_rows -= n_rows
+
+        future = self._batcher(key).submit(rows)
+        future.add_done_callback(release)
+        return future
+
+    def load(self, kind, name, backend=None):
+        if kind == "st":
+            return model_registry.get_sentence_transformer(name)
+        return model_registry.get_model(name, DEVICE, backend)
+
+    def _run(self, key, requests):
+        """All requests of a batch in one set of padded forward passes, split back per request."""
+        kind, name, backend, max_length = key
+        if kind == "st":
+            texts = [text for _, rows in requests for text in rows]
+            matrix = self.load(kind, name).encode(texts, batch_size=ST_BATCH_SIZE, convert_to_numpy=True,
+                                                  normalize_embeddings=True).astype("float32")
+        else:
+            from generate_embeddings import embed_token_windows
+            tokenizer, model = self.load(kind, name, backend)
+            windows = []
+            for field, rows in requests:
+                if field == "texts":
+                    rows = tokenizer(rows, truncation=True, max_length=max_length)["input_ids"]
+                windows.extend(rows)
+            matrix = embed_token_windows(windows, model, tokenizer.pad_token_id)
+
+        out, start = [], 0
+        for _, rows in requests:
+            out.append(matrix[start:start + len(rows)])
+            start += len(rows)
+        return out
+
+    def stats(self):
+        with self._lock:
+            batchers = dict(self._batchers)
+            stats = {"queued_rows": self.queued_rows, "rejected": self.rejected}
+        for (kind, name, backend, max_length), batcher in batchers.items():
+            stats[f"{kind}:{name}:{backend}:{max_length}"] = batcher.stats()
+        return stats
+
+
+# ---------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------
+class _Handler(BaseHTTPRequestHandler):
+    """POST /embed {"model", "kind", "backend", "max_length", "texts" | "input_ids"} -> float32 rows.
+
+    The response body is the raw row-major float32 matrix; X-Rows / X-Dim give its shape.
+    """
+    service = None
+    protocol_version = "HTTP/1.1"  # keep-alive: clients reuse one connection per thread
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._json(404, {"error": "not found"})
+        self._json(200, {"models": sorted(self.service.models), "stats": self.service.stats()})
+
+    def do_POST(self):
+        if self.path != "/embed":
+            return self._json(404, {"error": "not found"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            kind = body.get("kind", "hf")
+            name = body["model"]
+            field = "input_ids" if "input_ids" in body else "texts"
+            rows = body[field]
+        except (KeyError, ValueError) as e:
+            return self._json(400, {"error": f"bad request: {e!r}"})
+        if f"{kind}:{name}" not in self.service.models:
+            return self._json(400, {"error": f"model {kind}:{name} not served"})
+        if kind == "st" and field != "texts":
+            return self._json(400, {"error": "sentence-transformers models take texts"})
+        if not rows:
+            return self._matrix(np.zeros((0, 0), dtype="float32"))
+
+        backend = None if kind == "st" else body.get("backend") or embed_backend.DEFAULT_BACKEND
+        key = (kind, name, backend, body.get("max_length"))
+        try:
+            matrix = self.service.submit(key, (field, rows), len(rows)).result()
+        except Overloaded as e:
+            return self._json(503, {"error": f"overloaded: {e}"}, {"Retry-After": "1"})
+        except Exception as e:
+            tracing.log(logging.ERROR, "embed_failed", model=name, error=repr(e))
+            return self._json(500, {"error": repr(e)})
+        self._matrix(matrix)
+
+    def _matrix(self, matrix):
+        body = np.ascontiguousarray(matrix, dtype="float32").tobytes()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Rows", str(matrix.shape[0]))
+        self.send_header("X-Dim", str(matrix.shape[1] if matrix.ndim == 2 else 0))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(service, host=HOST, port=PORT):
+    handler = type("EmbedHandler", (_Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local embedding server shared by ingestion, the bot and the scorers")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--model", action="append", dest="models",
+                        help="kind:name to serve, e.g. hf:answerdotai/ModernBERT-base or st:all-MiniLM-L6-v2 "
+                             "(repeatable; default: the models this repo uses)")
+    parser.add_argument("--backend", choices=embed_backend.BACKENDS, default=embed_backend.DEFAULT_BACKEND,
+                        help="backend preloaded for hf models (clients may ask for another)")
+    parser.add_argument("--max-queued-rows", type=int, default=MAX_QUEUED_ROWS,
+                        help="texts / windows waiting before new requests get 503 + Retry-After")
+    parser.add_argument("--batch-max-size", type=int, default=MAX_BATCH_REQUESTS,
+                        help="requests merged into one batch")
+    parser.add_argument("--batch-wait-ms", type=float, default=MAX_WAIT_MS,
+                        help="how long a request waits for others to share its batch")
+    parser.add_argument("--lazy", action="store_true",
+                        help="load each model on its first request instead of at startup")
+    args = parser.parse_args()
+
+    service = EmbedService(models=args.models or DEFAULT_MODELS, max_queued_rows=args.max_queued_rows,
+                           max_batch=args.batch_max_size, max_wait_ms=args.batch_wait_ms)
+    if not args.lazy:
+        for spec in sorted(service.models):
+            kind, name = spec.split(":", 1)
+            service.load(kind, name, None if kind == "st" else args.backend)
+
+    server = serve(service, args.host, args.port)
+    print(f"✅ Embedding server on http://{args.host}:{args.port} ({', '.join(sorted(service.models))})")
+    server.serve_forever()
@@ -0,0 +1,120 @@
+import json
+from pathlib import Path
+import numpy as np
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+# One contiguous float32 matrix (row i = chunk i) plus a small JSON sidecar
+# holding the shape and the chunk id / FAISS id of every row.
+EMB_DIR = Path("embeddings")
+MATRIX_NAME = "embeddings.f32"
+META_NAME = "embeddings_meta.json"
+
+
+# ---------------------------------------------------------------------
+# Store
+# ---------------------------------------------------------------------
+class EmbeddingStore:
+    """Read-only view over the embedding matrix, memory-mapped (zero-copy)."""
+
+    def __init__(self, matrix, chunk_ids, faiss_ids):
+        self.matrix = matrix
+        self.chunk_ids = list(chunk_ids)
+        self.faiss_ids = np.asarray(faiss_ids, dtype="int64")
+        self._row_of_chunk = {cid: i for i, cid in enumerate(self.chunk_ids)}
+        self._row_of_id = {int(fid): i for i, fid in enumerate(self.faiss_ids)}
+
+    @classmethod
+    def open(cls, emb_dir=EMB_DIR):
+        emb_dir = Path(emb_dir)
+        meta = json.loads((emb_dir / META_NAME).read_text(encoding="utf-8"))
+        rows, dim = meta["rows"], meta["dim"]
+        expected = rows * dim * np.dtype(meta["dtype"]).itemsize
+        actual = (emb_dir / MATRIX_NAME).stat().st_size if (emb_dir / MATRIX_NAME).exists() else 0
+        if actual != expected:
+            # e.g. a crash between write_store's two renames
+            raise ValueError(f"❌ {emb_dir / MATRIX_NAME} holds {actual} bytes but {META_NAME} describes "
+                             f"{rows}x{dim} ({expected} bytes); rebuild with generate_embeddings.py --full")
+        if rows:
+            matrix = np.memmap(emb_dir / MATRIX_NAME, dtype=meta["dtype"], mode="r", shape=(rows, dim))
+        else:
+            matrix = np.zeros((0, dim), dtype=meta["dtype"])
+        return cls(matrix, meta["chunk_ids"], meta["faiss_ids"])
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def __contains__(self, chunk_id):
+        return chunk_id in self._row_of_chunk
+
+    def vector(self, chunk_id):
+        """1-D view of one chunk's embedding."""
+        return self.matrix[self._row_of_chunk[chunk_id]]
+
+    def vectors_for_ids(self, faiss_ids):
+        """(len(faiss_ids), dim) matrix for FAISS ids (rows are copied)."""
+        return self.matrix[[self._row_of_id[int(fid)] for fid in faiss_ids]]
+
+    def chunk_id_for(self, faiss_id):
+        return self.chunk_ids[self._row_of_id[int(faiss_id)]]
+
+
+def store_exists(emb_dir=EMB_DIR):
+    emb_dir = Path(emb_dir)
+    return (emb_dir / META_NAME).exists() and (emb_dir / MATRIX_NAME).exists()
+
+
+def write_store(matrix, chunk_ids, faiss_ids, emb_dir=EMB_DIR):
+    """Write matrix + sidecar, each to a temp file renamed into place.
+
+    Readers never see a half-written file, but the two renames are separate:
+    a crash between them leaves a new matrix beside the old sidecar, which
+    EmbeddingStore.open rejects when the sizes disagree.
+    """
+    emb_dir = Path(emb_dir)
+    emb_dir.mkdir(exist_ok=True)
+
+    matrix = np.ascontiguousarray(matrix, dtype="float32")
+    if matrix.ndim != 2 or matrix.shape[0] != len(chunk_ids) or len(chunk_ids) != len(faiss_ids):
+        raise ValueError("❌ matrix rows, chunk_ids and faiss_ids must line up")
+
+    meta = {
+        "dtype": "float32",
+        "rows": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]),
+        "chunk_ids": list(chunk_ids),
+        "faiss_ids": [int(fid) for fid in faiss_ids],
+    }
+
+    matrix_tmp = emb_dir / (MATRIX_NAME + ".tmp")
+    meta_tmp = emb_dir / (META_NAME + ".tmp")
+    matrix.tofile(matrix_tmp)
+    meta_tmp.write_text(json.dumps(meta), encoding="utf-8")
+    matrix_tmp.replace(emb_dir / MATRIX_NAME)
+    meta_tmp.replace(emb_dir / META_NAME)
+
+
+# ---------------------------------------------------------------------
+# Legacy layout (per-chunk .npy + all_embeddings.pkl)
+# ---------------------------------------------------------------------
+def migrate_legacy(emb_dir=EMB_DIR):
+    """Convert all_embeddings.pkl into the memory-mapped store.
+
+    FAISS ids are the DataFrame row positions, which is how the old flat
+    index was built.
+    """
+    import pandas as pd
+
+    emb_dir = Path(emb_dir)
+    df = pd.read_pickle(emb_dir / "all_embeddings.pkl")
+    write_store(df.to_numpy(), [str(cid) for cid in df.index], np.arange(df.shape[0]), emb_dir)
+    print(f"✅ Migrated {df.shape[0]} embeddings → {emb_dir / MATRIX_NAME}")
+
+
+if __name__ == "__main__":
+    migrate_legacy()
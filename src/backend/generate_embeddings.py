@@ -1,146 +1,475 @@
-import os
+import argparse
+import hashlib
+import json
+from collections import Counter
 from pathlib import Path
-import pickle
 import numpy as np
 import torch
-import pandas as pd
-import faiss
-from transformers import AutoTokenizer, AutoModel
+import model_registry
+import embed_backend
+import ingest_pipeline
+import chunking
+import lexical_index
+from embedding_store import EmbeddingStore, store_exists, write_store
+from chunk_store import ChunkStore, chunk_store_exists, write_chunk_store
+import index_factory
+import snapshots
+from embed_client import client_for
 
 # ---------------------------------------------------------------------
 # Configuration
 # ---------------------------------------------------------------------
 DOCS_DIR = Path("docs")
 EMB_DIR = Path("embeddings")
-CHUNKS_DIR = Path("chunks")
+FAISS_PATH = EMB_DIR / "faiss_index.bin"
+MANIFEST_PATH = EMB_DIR / "manifest.json"
 MODEL_NAME = "answerdotai/ModernBERT-base"
-CHUNK_SIZE = 512
+CHUNK_SIZE = 512          # max tokens per chunk
+CHUNK_OVERLAP = 64        # tokens of whole sentences shared with the previous chunk
 DEVICE = "cpu"
+EMBED_BACKEND = embed_backend.DEFAULT_BACKEND  # see embed_backend.BACKENDS
+INGEST_WORKERS = None     # tokenizer processes; None = pick from the number of files
+BATCH_SIZE = 16           # max chunks per forward pass
+EMBED_SERVER = None       # embed_server.py URL (default $EMBED_SERVER); None = load the model here
+LATE_CHUNKING = False     # pool chunk vectors out of long-context passes over each document
+MAX_BATCH_TOKENS = 8192   # max padded tokens (rows * longest row) per forward pass
 
 # ---------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------
 def load_model():
-    print("📌 Loading ModernBERT model (CPU)...")
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-    model = AutoModel.from_pretrained(MODEL_NAME).to(DEVICE)
-    model.eval()
-    return tokenizer, model
+    """(tokenizer, model) - the same copy the bot would use when both run in one process.
 
+    With an embedding server only the tokenizer is loaded (model is None).
+    """
+    if client_for(EMBED_SERVER) is not None:
+        return model_registry.get_tokenizer(MODEL_NAME), None
+    return model_registry.get_model(MODEL_NAME, DEVICE, EMBED_BACKEND)
 
-def embed_chunks(text: str, tokenizer, model):
-    """Yield tuple: (embedding np.array, chunk_text, chunk_index)."""
-    tokens = tokenizer(
-        text,
-        return_tensors="pt",
-        truncation=False,
-        padding=False
-    )
 
-    input_ids = tokens["input_ids"][0]
-    num_chunks = (len(input_ids) + CHUNK_SIZE - 1) // CHUNK_SIZE
+def split_chunks(text: str, tokenizer):
+    """Sentence-aligned, overlapping chunks of at most CHUNK_SIZE tokens (see chunking.py)."""
+    return chunking.chunk_document(text, tokenizer, CHUNK_SIZE, CHUNK_OVERLAP)
+
+
+def plan_batches(lengths, batch_size=BATCH_SIZE, max_batch_tokens=MAX_BATCH_TOKENS):
+    """Group window positions into batches, longest first, so padding stays small.
+
+    A batch holds at most ``batch_size`` windows and at most ``max_batch_tokens``
+    padded tokens (rows * longest row).
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches, current = [], []
+    for i in order:
+        # Sorted longest first, so the first window sets the padded width
+        if current and (len(current) >= batch_size or lengths[current[0]] * (len(current) + 1) > max_batch_tokens):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
 
-    with torch.no_grad():
-        for i in range(num_chunks):
-            chunk_ids = input_ids[i * CHUNK_SIZE:(i + 1) * CHUNK_SIZE]
-            chunk_input = {"input_ids": chunk_ids.unsqueeze(0).to(DEVICE)}
 
-            outputs = model(**chunk_input)
-            pooled = outputs.last_hidden_state.mean(dim=1)
+def embed_token_windows(windows, model, pad_token_id, batch_size=BATCH_SIZE, max_batch_tokens=MAX_BATCH_TOKENS):
+    """Embed token windows in padded, attention-masked batches.
+
+    Returns a float32 matrix (len(windows), dim) in the same order as ``windows``.
+    Each row is the mean of the window's hidden states (padding excluded),
+    L2-normalized - identical to running every window on its own.
+    """
+    if not windows:
+        return np.zeros((0, model.config.hidden_size), dtype="float32")
+
+    lengths = [len(w) for w in windows]
+    out = np.empty((len(windows), model.config.hidden_size), dtype="float32")
+
+    with torch.no_grad():
+        for batch in plan_batches(lengths, batch_size, max_batch_tokens):
+            hidden, attention_mask = forward_padded([windows[i] for i in batch], model, pad_token_id)
+            mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1)
             pooled = pooled / pooled.norm(dim=1, keepdim=True)
 
-            # Recover chunk text
-            chunk_text = tokenizer.decode(chunk_ids, skip_special_tokens=True)
+            out[batch] = pooled.cpu().numpy().astype("float32")
+
+    return out
+
 
-            yield pooled.cpu().numpy().astype("float32"), chunk_text, i
+def forward_padded(windows, model, pad_token_id):
+    """One forward pass over token windows padded to the longest; (last_hidden_state, attention_mask)."""
+    width = max(len(w) for w in windows)
+    input_ids = torch.full((len(windows), width), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(windows), width), dtype=torch.long)
+    for row, window in enumerate(windows):
+        input_ids[row, :len(window)] = torch.as_tensor(window)
+        attention_mask[row, :len(window)] = 1
+    attention_mask = attention_mask.to(DEVICE)
+    outputs = model(input_ids=input_ids.to(DEVICE), attention_mask=attention_mask)
+    return outputs.last_hidden_state, attention_mask
+
+
+def embed_token_spans(windows, spans, model, pad_token_id, batch_size=BATCH_SIZE, max_batch_tokens=MAX_BATCH_TOKENS):
+    """Late chunking: encode each (long) window once, mean-pool its hidden states over every span in it.
+
+    ``spans`` are (window index, start, end) positions in the window's input ids
+    (chunking.late_chunk_document). Returns a float32 matrix (len(spans), dim)
+    of L2-normalized rows in span order.
+    """
+    out = np.empty((len(spans), model.config.hidden_size), dtype="float32")
+    by_window = {}
+    for row, (w, start, end) in enumerate(spans):
+        by_window.setdefault(w, []).append((row, start, end))
+
+    lengths = [len(w) for w in windows]
+    with torch.no_grad():
+        for batch in plan_batches(lengths, batch_size, max_batch_tokens):
+            hidden, _ = forward_padded([windows[i] for i in batch], model, pad_token_id)
+            for b, i in enumerate(batch):
+                for row, start, end in by_window.get(i, ()):
+                    pooled = hidden[b, start:end].mean(dim=0)
+                    out[row] = (pooled / pooled.norm()).cpu().numpy()
+
+    return out
+
+
+def embed_documents(docs, tokenizer, model, batch_size=BATCH_SIZE, max_batch_tokens=MAX_BATCH_TOKENS):
+    """Embed many documents at once, batching chunks across document boundaries.
+
+    ``docs`` is an iterable of (name, text). Yields (name, chunk_index, embedding
+    of shape (1, dim), chunk_text) in document order.
+    """
+    keys, windows, texts = [], [], []
+    for name, text in docs:
+        for cidx, chunk in enumerate(split_chunks(text, tokenizer)):
+            keys.append((name, cidx))
+            windows.append(chunk.input_ids)
+            texts.append(chunk.text)  # sliced from the source, not decoded
+
+    matrix = embed_token_windows(windows, model, tokenizer.pad_token_id, batch_size, max_batch_tokens)
+
+    for (name, cidx), chunk_text, emb in zip(keys, texts, matrix):
+        yield name, cidx, emb.reshape(1, -1), chunk_text
+
+
+def embed_chunks(text: str, tokenizer, model):
+    """Yield tuple: (embedding np.array, chunk_text, chunk_index)."""
+    for _, cidx, emb, chunk_text in embed_documents([(None, text)], tokenizer, model):
+        yield emb, chunk_text, cidx
 
 
 # ---------------------------------------------------------------------
 # Processing
 # ---------------------------------------------------------------------
-def process_documents(tokenizer, model):
+def list_documents():
     if not DOCS_DIR.exists():
         raise FileNotFoundError("❌ docs/ not found")
 
+    files = sorted(list(DOCS_DIR.glob("*.txt")) + list(DOCS_DIR.glob("*.docx")))
+    if not files:
+        raise RuntimeError("❌ No .txt or .docx files found in docs/")
+    # documents (manifest entries, chunk names) are keyed by stem: a.txt and a.docx would overwrite each other
+    stems = Counter(path.stem for path in files)
+    clashes = sorted(path.name for path in files if stems[path.stem] > 1)
+    if clashes:
+        raise RuntimeError(f"❌ Documents in docs/ must have distinct names, rename one of: {', '.join(clashes)}")
+    return files
+
+
+def process_documents(tokenizer, model, files=None, workers=None):
+    """Embed ``files`` through the streaming ingest pipeline (see ingest_pipeline.py).
+
+    ``workers`` tokenizer processes (default INGEST_WORKERS); None picks from the
+    number of files, 0 tokenizes on a thread of this process.
+    """
+    if files is None:
+        files = list_documents()
+    if workers is None:
+        workers = INGEST_WORKERS
+    if workers is None:
+        workers = ingest_pipeline.default_workers(len(files))
+
     EMB_DIR.mkdir(exist_ok=True)
-    CHUNKS_DIR.mkdir(exist_ok=True)
 
-    rows = {}  # index -> embedding row
+    rows = {}   # chunk name -> embedding row
+    texts = {}  # chunk name -> chunk text
 
-    files = sorted(DOCS_DIR.glob("*.txt"))
-    if not files:
-        raise RuntimeError("❌ No .txt files found in docs/")
+    client = client_for(EMBED_SERVER)
+    print(f"📄 Embedding {len(files)} documents ({workers or 'no'} tokenizer workers"
+          f"{f', via {client.url}' if client else ''})\n")
+    if workers and client is None:
+        # leave the workers their cores so torch doesn't oversubscribe the machine
+        torch.set_num_threads(ingest_pipeline.inference_threads(workers))
 
-    print(f"📄 Found {len(files)} documents\n")
+    def embed_windows(windows, spans=None):
+        if spans is not None:
+            return embed_token_spans(windows, spans, model, tokenizer.pad_token_id)
+        if client is not None:
+            return client.embed(MODEL_NAME, input_ids=windows, backend=EMBED_BACKEND)
+        return embed_token_windows(windows, model, tokenizer.pad_token_id)
 
-    for fidx, file_path in enumerate(files, start=1):
-        print(f"➡️ [{fidx}/{len(files)}] {file_path.name}")
-        text = file_path.read_text(encoding="utf-8")
+    stats = ingest_pipeline.IngestStats()
+    docs = ingest_pipeline.run(files, tokenizer, embed_windows, MODEL_NAME, CHUNK_SIZE, CHUNK_OVERLAP,
+                               workers=workers, stats=stats, late=LATE_CHUNKING)
+    for fidx, (doc, matrix) in enumerate(docs, start=1):
+        print(f"➡️ [{fidx}/{len(files)}] {doc.name}")
+        for cidx, (emb, chunk_text) in enumerate(zip(matrix, doc.texts)):
+            chunk_name = f"{doc.name}_{cidx}"
+            rows[chunk_name] = emb
+            texts[chunk_name] = chunk_text
 
-        base_name = file_path.stem
+    print(stats.report())
+    return rows, texts
+
+
+def doc_name(chunk_name: str) -> str:
+    """nhsdoc3_2 -> nhsdoc3"""
+    return chunk_name.rsplit("_", 1)[0]
+
+
+# ---------------------------------------------------------------------
+# Manifest (content hashes + model fingerprint)
+# ---------------------------------------------------------------------
+def fingerprint():
+    """Settings that change every vector - if any differ, nothing can be reused."""
+    settings = {"model": MODEL_NAME, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP,
+                "chunker": "sentences"}
+    if LATE_CHUNKING:
+        settings["pooling"] = "late"
+    if EMBED_BACKEND != "torch":
+        # quantized / ONNX vectors drift slightly from fp32, so don't mix them in one index
+        settings["backend"] = EMBED_BACKEND
+    return settings
 
-        for emb, chunk_text, cidx in embed_chunks(text, tokenizer, model):
-            chunk_name = f"{base_name}_{cidx}"
 
-            # Save embedding vector
-            np.save(EMB_DIR / f"{chunk_name}.npy", emb)
+def file_sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
 
-            # Save chunk text
-            (CHUNKS_DIR / f"{chunk_name}.txt").write_text(chunk_text, encoding="utf-8")
 
-            rows[chunk_name] = emb.squeeze()
+def load_manifest():
+    if not MANIFEST_PATH.exists():
+        return None
+    return json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
 
-    return rows
+
+def save_manifest(manifest):
+    tmp_path = MANIFEST_PATH.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    tmp_path.replace(MANIFEST_PATH)
+
+
+def build_manifest(files, chunk_ids, faiss_ids):
+    """Manifest for a freshly built index: doc -> hash, chunk names and FAISS ids."""
+    hashes = {path.stem: file_sha256(path) for path in files}
+    docs = {name: {"sha256": digest, "chunks": [], "faiss_ids": []} for name, digest in hashes.items()}
+    for chunk_name, fid in zip(chunk_ids, faiss_ids):
+        entry = docs[doc_name(chunk_name)]
+        entry["chunks"].append(chunk_name)
+        entry["faiss_ids"].append(int(fid))
+
+    return {
+        "fingerprint": fingerprint(),
+        "next_id": int(max(faiss_ids, default=-1)) + 1,
+        "docs": docs,
+    }
 
 
 # ---------------------------------------------------------------------
 # Save global representation
 # ---------------------------------------------------------------------
-def save_all_embeddings(rows):
-    print("\n💾 Saving combined embedding dataframe...")
+def save_all_embeddings(rows, texts, faiss_ids):
+    print("\n💾 Saving embedding + chunk stores...")
 
-    df = pd.DataFrame.from_dict(rows, orient="index")
-    df.index.name = "chunk_id"
-    df.to_pickle(EMB_DIR / "all_embeddings.pkl")
+    dim = len(next(iter(rows.values()))) if rows else 0
+    matrix = np.stack(list(rows.values())) if rows else np.zeros((0, dim), dtype="float32")
+    write_store(matrix, list(rows), faiss_ids, EMB_DIR)
+    write_chunk_store(faiss_ids, list(rows), [doc_name(c) for c in rows], [texts[c] for c in rows], EMB_DIR)
 
-    print(f"✅ DataFrame saved → {EMB_DIR}/all_embeddings.pkl")
-    print(f"📊 Rows: {df.shape[0]}  |  Dimensions: {df.shape[1]}")
-    return df
+    print(f"✅ Embedding + chunk stores saved → {EMB_DIR}")
+    print(f"📊 Rows: {matrix.shape[0]}  |  Dimensions: {dim}")
 
 
 def build_faiss_index():
+    """Build the index straight from the memory-mapped embedding store."""
     print("\n📌 Building FAISS index from combined embeddings...")
 
-    emb_dir = Path("embeddings")
-    df_path = emb_dir / "all_embeddings.pkl"
-    index_path = emb_dir / "faiss_index.bin"
+    if not store_exists(EMB_DIR):
+        raise FileNotFoundError("❌ Missing embedding store — run embedding generation first")
 
-    if not df_path.exists():
-        raise FileNotFoundError("❌ Missing all_embeddings.pkl — run embedding generation first")
+    store = EmbeddingStore.open(EMB_DIR)
+    dim = store.dim
 
-    df = pd.read_pickle(df_path)
+    # Kind + search params come from embeddings/index_config.json (flat by default)
+    config = index_factory.load_config(EMB_DIR)
+    index = index_factory.build_index(store.matrix, store.faiss_ids, config)
 
-    # Convert to float32 matrix
-    emb_matrix = df.to_numpy().astype("float32")
-    dim = emb_matrix.shape[1]
+    index_factory.save_index(index, FAISS_PATH)
 
-    index = faiss.IndexFlatIP(dim)
-    index.add(emb_matrix)
+    print(f"✅ FAISS index created and saved to: {FAISS_PATH}")
+    print(f"📊 Index size: {len(store)} vectors | dim = {dim} | {index_factory.describe(index)}")
 
-    faiss.write_index(index, str(index_path))
 
-    print(f"✅ FAISS index created and saved to: {index_path}")
-    print(f"📊 Index size: {emb_matrix.shape[0]} vectors | dim = {dim}")
+# ---------------------------------------------------------------------
+# Full / incremental builds
+# ---------------------------------------------------------------------
+def full_rebuild(tokenizer, model):
+    files = list_documents()
+    rows, texts = process_documents(tokenizer, model, files)
+    ids = np.arange(len(rows), dtype="int64")
+    save_all_embeddings(rows, texts, ids)
+    build_faiss_index()
+    lexical_index.build_from_chunk_store(EMB_DIR)
+    save_manifest(build_manifest(files, list(rows), ids))
+
+
+def incremental_update(tokenizer, model):
+    """Embed only new/changed documents and patch the existing index in place."""
+    manifest = load_manifest()
+    if manifest is None or manifest.get("fingerprint") != fingerprint():
+        print("ℹ️ No manifest for the current model/chunking settings — doing a full rebuild")
+        return full_rebuild(tokenizer, model)
+    if not FAISS_PATH.exists() or not store_exists(EMB_DIR) or not chunk_store_exists(EMB_DIR):
+        print("ℹ️ Index files missing — doing a full rebuild")
+        return full_rebuild(tokenizer, model)
+
+    index = index_factory.load_index(FAISS_PATH, EMB_DIR)
+    if not index_factory.supports_ids(index):
+        print("ℹ️ Index has no ID map (built by an older version) — doing a full rebuild")
+        return full_rebuild(tokenizer, model)
+
+    files = list_documents()
+    current = {path.stem: (path, file_sha256(path)) for path in files}
+    known = manifest["docs"]
+
+    deleted = [name for name in known if name not in current]
+    changed = [name for name in current if name in known and known[name]["sha256"] != current[name][1]]
+    added = [name for name in current if name not in known]
+    print(f"📄 {len(added)} new | {len(changed)} changed | {len(deleted)} deleted | "
+          f"{len(current) - len(added) - len(changed)} unchanged")
+
+    if not (added or changed or deleted):
+        print("✅ Index already up to date")
+        if not lexical_index.lexical_index_exists(EMB_DIR):
+            lexical_index.build_from_chunk_store(EMB_DIR)
+        return
+
+    # 1) Drop vectors and store rows of deleted / changed documents
+    stale = deleted + changed
+    stale_ids = np.array([fid for name in stale for fid in known[name]["faiss_ids"]], dtype="int64")
+    stale_chunks = set(chunk for name in stale for chunk in known[name]["chunks"])
+    # HNSW cannot drop vectors - it is rebuilt from the store below instead
+    patch_index = index_factory.supports_remove(index) or not len(stale_ids)
+    if len(stale_ids) and patch_index:
+        index.remove_ids(stale_ids)
+    for name in stale:
+        del known[name]
+
+    store = EmbeddingStore.open(EMB_DIR)
+    keep = [i for i, cid in enumerate(store.chunk_ids) if cid not in stale_chunks]
+    kept_matrix = np.asarray(store.matrix[keep], dtype="float32")
+    kept_chunks = [store.chunk_ids[i] for i in keep]
+    kept_ids = store.faiss_ids[keep]
+    del store  # release the memmap before the files are replaced
+
+    chunks = ChunkStore.open(EMB_DIR)
+    kept_records = [chunks.get(fid) for fid in kept_ids]
+    del chunks
+
+    # 2) Embed new / changed documents and add them under fresh ids
+    to_embed = changed + added
+    new_rows, new_texts = process_documents(tokenizer, model, [current[name][0] for name in to_embed])
+    for name in to_embed:
+        known[name] = {"sha256": current[name][1], "chunks": [], "faiss_ids": []}
+
+    next_id = manifest["next_id"]
+    new_ids = np.arange(next_id, next_id + len(new_rows), dtype="int64")
+    for chunk_name, fid in zip(new_rows, new_ids):
+        known[doc_name(chunk_name)]["chunks"].append(chunk_name)
+        known[doc_name(chunk_name)]["faiss_ids"].append(int(fid))
+    manifest["next_id"] = next_id + len(new_rows)
+
+    new_matrix = np.zeros((0, kept_matrix.shape[1]), dtype="float32")
+    if new_rows:
+        new_matrix = np.stack(list(new_rows.values())).astype("float32")
+        if patch_index:
+            index.add_with_ids(new_matrix, new_ids)
+
+    print("\n💾 Saving embedding + chunk stores...")
+    all_chunks = kept_chunks + list(new_rows)
+    all_ids = np.concatenate([kept_ids, new_ids])
+    write_store(np.concatenate([kept_matrix, new_matrix]), all_chunks, all_ids, EMB_DIR)
+    write_chunk_store(all_ids, all_chunks,
+                      [c.doc for c in kept_records] + [doc_name(c) for c in new_rows],
+                      [c.text for c in kept_records] + [new_texts[c] for c in new_rows], EMB_DIR)
+    if patch_index:
+        index_factory.save_index(index, FAISS_PATH)
+        print(f"✅ FAISS index updated in place: {index.ntotal} vectors")
+    else:
+        build_faiss_index()
+    lexical_index.build_from_chunk_store(EMB_DIR)
+    save_manifest(manifest)
 
 
 # ---------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------
 def main():
+    global EMBED_BACKEND, INGEST_WORKERS, CHUNK_SIZE, CHUNK_OVERLAP, EMBED_SERVER, LATE_CHUNKING
+    parser = argparse.ArgumentParser(description="Embed docs/ into the FAISS index")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore the manifest and rebuild everything from scratch")
+    parser.add_argument("--index", choices=index_factory.INDEX_KINDS,
+                        help="switch the FAISS index type (saved in embeddings/index_config.json)")
+    parser.add_argument("--nlist", type=int, help="IVF clusters")
+    parser.add_argument("--nprobe", type=int, help="IVF clusters visited per query (query-time: no rebuild)")
+    parser.add_argument("--ef-search", type=int, help="HNSW candidate list size per query (query-time: no rebuild)")
+    parser.add_argument("--pq-m", type=int, help="IVF-PQ sub-quantizers")
+    parser.add_argument("--backend", choices=embed_backend.BACKENDS, default=EMBED_BACKEND,
+                        help="embedding inference backend (changing it re-embeds everything)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="max tokens per chunk (changing it re-embeds everything)")
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP,
+                        help="tokens of whole sentences repeated between neighbouring chunks")
+    parser.add_argument("--workers", type=int,
+                        help="tokenizer processes (0 = tokenize in-process; default picks from the file count)")
+    parser.add_argument("--embed-server",
+                        help="embed through embed_server.py at this URL (default: $EMBED_SERVER) "
+                             "instead of loading the model here")
+    parser.add_argument("--late-chunking", action="store_true",
+                        help="embed each document in long-context passes (up to 8k tokens) and mean-pool every "
+                             "chunk's span of it (changing it re-embeds everything); see bench_late_chunking.py")
+    args = parser.parse_args()
+    if args.late_chunking and client_for(args.embed_server) is not None:
+        parser.error("--late-chunking pools hidden states, so it needs the model in this process, not --embed-server")
+    LATE_CHUNKING = args.late_chunking
+    EMBED_SERVER = args.embed_server
+    EMBED_BACKEND = args.backend
+    INGEST_WORKERS = args.workers
+    CHUNK_SIZE, CHUNK_OVERLAP = args.chunk_size, args.chunk_overlap
+
+    EMB_DIR.mkdir(exist_ok=True)
+    config = index_factory.load_config(EMB_DIR)
+    overrides = {"kind": args.index, "nlist": args.nlist, "nprobe": args.nprobe,
+                 "ef_search": args.ef_search, "pq_m": args.pq_m}
+    overrides = {key: value for key, value in overrides.items() if value is not None}
+    changed = {key for key, value in overrides.items() if config[key] != value}
+    rebuild_index = bool(changed - set(index_factory.SEARCH_KEYS))
+    if changed:
+        config.update(overrides)
+        index_factory.save_config(config, EMB_DIR)
+        if not rebuild_index:
+            print(f"✅ Search parameters updated ({', '.join(sorted(changed))}), applied when the index is loaded")
+
     tokenizer, model = load_model()
-    rows = process_documents(tokenizer, model)
-    save_all_embeddings(rows)
-    build_faiss_index()
+    if args.full:
+        full_rebuild(tokenizer, model)
+    else:
+        incremental_update(tokenizer, model)
+        if rebuild_index:
+            # New index settings only need the stored vectors, not re-embedding
+            build_faiss_index()
+    # running bots pick this up and swap it in without a restart
+    snapshots.publish(EMB_DIR)
     print("\n🎉 ✅ Finished processing all documents!")
 
 
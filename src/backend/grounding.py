@@ -0,0 +1,71 @@
+import colorsys
+import html
+import re
+import numpy as np
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+MAX_PARAGRAPH_TOKENS = 128  # paragraphs are truncated to this for scoring, to bound latency
+
+
+def split_paragraphs(text: str):
+    """Blank-line separated paragraphs, stripped, empties dropped."""
+    return [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+
+
+# ---------------------------------------------------------------------
+# Scoring
+# ---------------------------------------------------------------------
+def paragraph_similarities(paragraph_vecs: np.ndarray, chunk_vecs: np.ndarray) -> np.ndarray:
+    """(paragraphs, chunks) cosine matrix; both inputs are L2-normalized rows."""
+    return np.asarray(paragraph_vecs, dtype="float32") @ np.asarray(chunk_vecs, dtype="float32").T
+
+
+def score_answer(answer: str, chunk_vecs, embed_batch, reduce="max"):
+    """[(paragraph, grounding score)] against the retrieved chunks, in answer order.
+
+    ``chunk_vecs`` are the stored embeddings of the chunks the answer was
+    generated from (not re-embedded); ``embed_batch(list_of_str)`` embeds all
+    paragraphs in one pass. ``reduce`` is "max" (best supporting chunk) or
+    "mean" (average over the retrieved chunks). A list, not a dict, so
+    repeated paragraphs ("Yes.", a disclaimer) each keep their place.
+    """
+    paragraphs = split_paragraphs(answer)
+    if not paragraphs or chunk_vecs is None or len(chunk_vecs) == 0:
+        return []
+
+    sims = paragraph_similarities(embed_batch(paragraphs), chunk_vecs)
+    values = sims.max(axis=1) if reduce == "max" else sims.mean(axis=1)
+    return [(para, float(v)) for para, v in zip(paragraphs, values)]
+
+
+# ---------------------------------------------------------------------
+# Rendering (same red -> green scale as mock_backend/mock.py)
+# ---------------------------------------------------------------------
+def clamp01(x):
+    try:
+        return max(0.0, min(1.0, float(x)))
+    except Exception:
+        return 0.0
+
+
+def score_to_hex(score: float) -> str:
+    """Convert [0,1] score to red→green hex colour (HSL hue 0→120)."""
+    s = clamp01(score)
+    hue = (120.0 * s) / 360.0
+    r, g, b = colorsys.hls_to_rgb(hue, 0.40, 0.85)
+    return f'#{int(r*255):02x}{int(g*255):02x}{int(b*255):02x}'
+
+
+def render_scored_answer(scores) -> str:
+    """[(paragraph, score)] (or a paragraph -> score dict) as coloured HTML paragraphs."""
+    blocks = []
+    for para, score in (scores.items() if isinstance(scores, dict) else scores):
+        colour = score_to_hex(score)
+        safe_text = html.escape(str(para)).replace("\n", "<br>")
+        blocks.append(
+            f"<p style='color:{colour}; margin:0 0 12px 0;' title='grounding {clamp01(score):.2f}'>"
+            f"{safe_text}</p>"
+        )
+    return "<div>" + "".join(blocks) + "</div>"
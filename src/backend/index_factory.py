@@ -0,0 +1,160 @@
+import json
+from pathlib import Path
+import numpy as np
+import faiss
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+EMB_DIR = Path("embeddings")
+CONFIG_NAME = "index_config.json"
+
+INDEX_KINDS = ("flat", "ivf", "hnsw", "ivfpq")
+MIN_POINTS_PER_LIST = 39  # FAISS warns below this many training points per cluster
+
+DEFAULT_CONFIG = {
+    "kind": "flat",
+    "nlist": 1024,      # IVF / IVF-PQ: number of coarse clusters
+    "nprobe": 16,       # IVF / IVF-PQ: clusters visited per query
+    "hnsw_m": 32,       # HNSW: neighbours per node
+    "ef_construction": 200,
+    "ef_search": 64,    # HNSW: candidate list size per query
+    "pq_m": 64,         # IVF-PQ: sub-quantizers (must divide dim)
+    "pq_nbits": 8,
+}
+# Query-time knobs, applied by load_index / apply_search_params: changing them
+# only rewrites index_config.json, never retrains or rebuilds the index
+SEARCH_KEYS = ("nprobe", "ef_search")
+
+
+# ---------------------------------------------------------------------
+# Config persistence
+# ---------------------------------------------------------------------
+def load_config(emb_dir=EMB_DIR):
+    config = dict(DEFAULT_CONFIG)
+    path = Path(emb_dir) / CONFIG_NAME
+    if path.exists():
+        config.update(json.loads(path.read_text(encoding="utf-8")))
+    return config
+
+
+def save_config(config, emb_dir=EMB_DIR):
+    path = Path(emb_dir) / CONFIG_NAME
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(config, indent=2), encoding="utf-8")
+    tmp_path.replace(path)  # published snapshots hard-link this file
+
+
+# ---------------------------------------------------------------------
+# Build / load
+# ---------------------------------------------------------------------
+def effective_kind(config, n, dim):
+    """Fall back to flat when there are too few vectors to train the requested index."""
+    kind = config["kind"]
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"❌ Unknown index kind {kind!r}, expected one of {INDEX_KINDS}")
+    if kind in ("ivf", "ivfpq") and n < 2 * MIN_POINTS_PER_LIST:
+        return "flat"
+    if kind == "ivfpq" and (dim % config["pq_m"] or n < 2 ** config["pq_nbits"]):
+        return "flat"
+    return kind
+
+
+def make_index(config, dim, n):
+    """Empty (untrained) index for ``n`` vectors of size ``dim``, inner-product metric."""
+    kind = effective_kind(config, n, dim)
+    # Shrink nlist on small corpora so every cluster gets enough training points
+    nlist = max(1, min(config["nlist"], n // MIN_POINTS_PER_LIST))
+
+    if kind == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+    if kind == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dim, config["hnsw_m"], faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efConstruction = config["ef_construction"]
+        return faiss.IndexIDMap2(hnsw)
+
+    quantizer = faiss.IndexFlatIP(dim)
+    if kind == "ivf":
+        return faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+    return faiss.IndexIVFPQ(quantizer, dim, nlist, config["pq_m"], config["pq_nbits"],
+                            faiss.METRIC_INNER_PRODUCT)
+
+
+def build_index(matrix, ids, config):
+    """Train (if needed) and fill an index; IVF variants are trained on ``matrix`` itself."""
+    matrix = np.ascontiguousarray(matrix, dtype="float32")
+    n, dim = matrix.shape
+    index = make_index(config, dim, n)
+    if not index.is_trained:
+        index.train(matrix)
+    index.add_with_ids(matrix, np.asarray(ids, dtype="int64"))
+    apply_search_params(index, config)
+    return index
+
+
+def base_index(index):
+    """The index under an IndexIDMap2 wrapper, downcast to its concrete type."""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def apply_search_params(index, config):
+    """Set nprobe / efSearch - these are query-time knobs, not stored in the index file."""
+    inner = base_index(index)
+    if isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = min(config["nprobe"], inner.nlist)
+    elif isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = config["ef_search"]
+    return index
+
+
+def supports_ids(index):
+    return isinstance(index, (faiss.IndexIDMap2, faiss.IndexIVF))
+
+
+def supports_remove(index):
+    """HNSW graphs cannot drop vectors; flat and IVF can."""
+    return supports_ids(index) and not isinstance(base_index(index), faiss.IndexHNSW)
+
+
+def describe(index):
+    inner = base_index(index)
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return f"IVF{inner.nlist},PQ{inner.pq.M} (nprobe={inner.nprobe})"
+    if isinstance(inner, faiss.IndexIVF):
+        return f"IVF{inner.nlist},Flat (nprobe={inner.nprobe})"
+    if isinstance(inner, faiss.IndexHNSW):
+        return f"HNSW (efSearch={inner.hnsw.efSearch})"
+    return "Flat"
+
+
+def save_index(index, index_path):
+    """Write via a temp file + rename: servers may have the old file memory-mapped."""
+    index_path = Path(index_path)
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    faiss.write_index(index, str(tmp_path))
+    tmp_path.replace(index_path)
+
+
+def load_index(index_path, emb_dir=EMB_DIR, mmap=False):
+    """Read an index and re-apply the persisted search parameters.
+
+    mmap=True maps the vectors / inverted lists from the file read-only instead
+    of copying them, so processes serving the same file share one page-cache copy.
+    IVF inverted lists are mapped by IO_FLAG_MMAP alone (FAISS rejects them with
+    IO_FLAG_MMAP_IFC); if mapping fails anyway the index is read into memory.
+    """
+    config = load_config(emb_dir)
+    if not mmap:
+        return apply_search_params(faiss.read_index(str(index_path)), config)
+
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    if config["kind"] not in ("ivf", "ivfpq"):
+        flags |= getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    try:
+        index = faiss.read_index(str(index_path), flags)
+    except RuntimeError as e:
+        print(f"⚠️ Could not memory-map {index_path} ({str(e).strip().splitlines()[-1]}); reading it into memory")
+        index = faiss.read_index(str(index_path))
+    return apply_search_params(index, config)
@@ -0,0 +1,230 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import chunking
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+# read/parse + tokenize (process pool) -> batched inference (thread) -> caller persists
+QUEUE_SIZE = 64            # tokenized documents buffered ahead of inference
+INFERENCE_WINDOWS = 128    # windows gathered per embed call (it sub-batches by token budget itself)
+MIN_FILES_FOR_POOL = 64    # below this, worker start-up costs more than it saves
+
+# spans: None, or for late chunking (window, start, end) per chunk - windows are then long passes
+TokenizedDoc = namedtuple("TokenizedDoc", ["name", "windows", "texts", "n_tokens", "seconds", "spans"],
+                          defaults=(None,))
+_DONE = object()
+
+
+class _Failure:
+    """Exception raised in a stage thread, handed downstream to be re-raised by the caller."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+# ---------------------------------------------------------------------
+# Stage 1: read / parse + tokenize (runs in worker processes)
+# ---------------------------------------------------------------------
+def read_document(path):
+    path = Path(path)
+    if path.suffix.lower() == ".docx":
+        import docx  # python-docx, only needed for Word files
+        return "\n".join(p.text for p in docx.Document(str(path)).paragraphs)
+    return path.read_text(encoding="utf-8")
+
+
+_tokenizer = None
+_chunk_size = None
+_overlap = None
+_late = False
+
+
+def init_tokenizer(tokenizer, chunk_size, overlap, late=False):
+    """Set the tokenizer used by tokenize_file in this process (a name is loaded here)."""
+    global _tokenizer, _chunk_size, _overlap, _late
+    if isinstance(tokenizer, str):
+        # one core per worker: the pool is the parallelism
+        os.environ["TOKENIZERS_PARALLELISM"] = "false"
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(tokenizer)
+    _tokenizer = tokenizer
+    _chunk_size = chunk_size
+    _overlap = overlap
+    _late = late
+
+
+def tokenize_file(path):
+    """Read one document and cut it into sentence-aligned chunks (see chunking.chunk_document)."""
+    start = time.perf_counter()
+    text = read_document(path)
+    spans = None
+    if _late:
+        chunks, windows, spans = chunking.late_chunk_document(text, _tokenizer, _chunk_size, _overlap)
+    else:
+        chunks = chunking.chunk_document(text, _tokenizer, _chunk_size, _overlap)
+        windows = [c.input_ids for c in chunks]
+    return TokenizedDoc(Path(path).stem, windows, [c.text for c in chunks],
+                        sum(len(w) for w in windows), time.perf_counter() - start, spans)
+
+
+def available_cores():
+    """Cores this process may run on (respects taskset / container CPU pinning)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def default_workers(n_files):
+    """A quarter of the cores tokenize, the rest run inference; 0 (in-process) on small jobs / machines."""
+    if n_files < MIN_FILES_FOR_POOL:
+        return 0
+    return min(8, available_cores() // 4)
+
+
+def inference_threads(workers):
+    """Cores left for torch once the tokenizer workers have one each."""
+    return max(1, available_cores() - workers)
+
+
+# ---------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------
+class IngestStats:
+    def __init__(self):
+        self.docs = 0
+        self.chunks = 0
+        self.tokens = 0
+        self.tokenize_s = 0.0   # summed over workers
+        self.inference_s = 0.0
+        self.wall_s = 0.0
+
+    def report(self):
+        wall = self.wall_s or 1e-9
+        return (f"⏱️ {self.docs} docs, {self.chunks} chunks, {self.tokens} tokens in {self.wall_s:.2f}s "
+                f"→ {self.docs / wall:.1f} docs/s, {self.tokens / wall:.0f} tokens/s "
+                f"(tokenize {self.tokenize_s:.2f}s across workers, inference {self.inference_s:.2f}s)")
+
+
+def _feed(files, workers, tokenizer, tokenizer_name, chunk_size, overlap, late, out_q, stop):
+    """Stage 1: tokenize files in order, with at most 2 * workers files in flight."""
+    try:
+        if workers == 0:
+            init_tokenizer(tokenizer, chunk_size, overlap, late)
+            for path in files:
+                if stop.is_set():
+                    return
+                out_q.put(tokenize_file(path))
+            return
+
+        ctx = multiprocessing.get_context("spawn")  # never fork a process holding torch threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=init_tokenizer,
+                                 initargs=(tokenizer_name, chunk_size, overlap, late)) as pool:
+            in_flight = deque()
+            for path in files:
+                if stop.is_set():
+                    break
+                in_flight.append(pool.submit(tokenize_file, str(path)))
+                if len(in_flight) >= 2 * workers:
+                    out_q.put(in_flight.popleft().result())
+            while in_flight and not stop.is_set():
+                out_q.put(in_flight.popleft().result())
+            pool.shutdown(cancel_futures=True)
+    except Exception as e:
+        out_q.put(_Failure(e))
+    finally:
+        out_q.put(_DONE)
+
+
+def _infer(in_q, out_q, embed_windows, batch_windows, stats):
+    """Stage 2: embed the windows of several documents per call, emit (doc, matrix) in order.
+
+    Late-chunked documents come with spans, and the call gets them (re-based onto
+    the combined window list) as embed_windows(windows, spans): one row per span.
+    """
+    pending = []
+
+    def flush():
+        start = time.perf_counter()
+        windows, spans = [], []
+        for doc in pending:
+            if doc.spans is not None:
+                spans.extend((len(windows) + w, s, e) for w, s, e in doc.spans)
+            windows.extend(doc.windows)
+        matrix = embed_windows(windows, spans) if pending[0].spans is not None else embed_windows(windows)
+        stats.inference_s += time.perf_counter() - start
+        row = 0
+        for doc in pending:
+            out_q.put((doc, matrix[row:row + len(doc.texts)]))
+            row += len(doc.texts)
+        pending.clear()
+
+    try:
+        while True:
+            item = in_q.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                out_q.put(item)
+                return
+            stats.tokenize_s += item.seconds
+            pending.append(item)
+            if sum(len(doc.windows) for doc in pending) >= batch_windows:
+                flush()
+        if pending:
+            flush()
+    except Exception as e:
+        out_q.put(_Failure(e))
+    finally:
+        out_q.put(_DONE)
+
+
+def run(files, tokenizer, embed_windows, tokenizer_name, chunk_size, overlap, workers=None,
+        queue_size=QUEUE_SIZE, batch_windows=INFERENCE_WINDOWS, stats=None, late=False):
+    """Yield (TokenizedDoc, embeddings of its chunks) for every file, in file order.
+
+    The caller is the persistence stage. ``embed_windows(list_of_token_id_lists)``
+    returns a (n, dim) matrix; with ``late`` it is called as embed_windows(windows,
+    spans) and returns one row per span. ``workers`` tokenizer processes (None:
+    pick from the file count, 0: tokenize on a thread of this process).
+    """
+    files = list(files)
+    if workers is None:
+        workers = default_workers(len(files))
+    stats = stats if stats is not None else IngestStats()
+
+    tokenized_q = queue.Queue(maxsize=queue_size)
+    embedded_q = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=_feed, name="ingest-tokenize", daemon=True,
+                         args=(files, workers, tokenizer, tokenizer_name, chunk_size, overlap, late,
+                               tokenized_q, stop)),
+        threading.Thread(target=_infer, name="ingest-inference", daemon=True,
+                         args=(tokenized_q, embedded_q, embed_windows, batch_windows, stats)),
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = embedded_q.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            doc, matrix = item
+            stats.docs += 1
+            stats.chunks += len(doc.texts)
+            stats.tokens += doc.n_tokens
+            yield doc, matrix
+    finally:
+        stop.set()
+        stats.wall_s = time.perf_counter() - start
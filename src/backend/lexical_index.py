@@ -0,0 +1,154 @@
+import re
+from pathlib import Path
+import numpy as np
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+# BM25 inverted index over the chunk store, written next to faiss_index.bin.
+# Postings are stored CSR-style (term -> slice of rows) with the BM25 weight of
+# every (term, chunk) pair precomputed, so a query is a few array sums.
+EMB_DIR = Path("embeddings")
+INDEX_NAME = "bm25.npz"
+K1 = 1.2
+B = 0.75
+RRF_K = 60                 # reciprocal rank fusion damping constant
+KEYWORD_MAX_TERMS = 3      # queries this short (and not questions) skip the dense pass
+
+# Words, numbers, and hyphen / apostrophe compounds ("co-codamol", "5-htp")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['\-][a-z0-9]+)*")
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in into is it its
+me my of on or should so than that the their them then there these they this to was
+we what when where which who why will with you your
+""".split())
+QUESTION_WORDS = frozenset("what when where which who why how can could should would does do is are".split())
+
+
+def tokenize(text):
+    """'Is Co-codamol safe?' -> ['co-codamol', 'safe'] (lower-cased, stop words dropped, no stemming)."""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def looks_like_keywords(query, index):
+    """True for short, non-question queries whose terms are all indexed - e.g. "sertraline dose"."""
+    text = query.strip()
+    words = text.lower().split()
+    if not words or text.endswith("?") or words[0] in QUESTION_WORDS:
+        return False
+    terms = tokenize(text)
+    return 0 < len(terms) <= KEYWORD_MAX_TERMS and all(t in index.vocab for t in terms)
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank). Best first."""
+    scores = {}
+    for ranking in rankings:
+        for rank, fid in enumerate(ranking, start=1):
+            scores[fid] = scores.get(fid, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+# ---------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------
+class BM25Index:
+    def __init__(self, terms, indptr, rows, weights, faiss_ids):
+        self.terms = terms
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        self.indptr = indptr
+        self.rows = rows
+        self.weights = weights
+        self.faiss_ids = np.asarray(faiss_ids, dtype="int64")
+
+    @classmethod
+    def build(cls, texts, faiss_ids, k1=K1, b=B):
+        docs = [tokenize(text) for text in texts]
+        n_docs = len(docs)
+        doc_len = np.array([len(d) for d in docs], dtype="float32")
+        avgdl = float(doc_len.mean()) if n_docs and doc_len.sum() else 1.0
+
+        postings = {}  # term -> {row: tf}
+        for row, tokens in enumerate(docs):
+            for term in tokens:
+                tfs = postings.setdefault(term, {})
+                tfs[row] = tfs.get(row, 0) + 1
+
+        terms = sorted(postings)
+        indptr = np.zeros(len(terms) + 1, dtype="int64")
+        rows, weights = [], []
+        for i, term in enumerate(terms):
+            tfs = postings[term]
+            df = len(tfs)
+            idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            r = np.fromiter(tfs.keys(), dtype="int32", count=df)
+            tf = np.fromiter(tfs.values(), dtype="float32", count=df)
+            norm = k1 * (1.0 - b + b * doc_len[r] / avgdl)
+            rows.append(r)
+            weights.append((idf * tf * (k1 + 1.0) / (tf + norm)).astype("float32"))
+            indptr[i + 1] = indptr[i] + df
+
+        return cls(
+            np.array(terms, dtype=str),
+            indptr,
+            np.concatenate(rows) if rows else np.zeros(0, dtype="int32"),
+            np.concatenate(weights) if weights else np.zeros(0, dtype="float32"),
+            faiss_ids,
+        )
+
+    def __len__(self):
+        return len(self.faiss_ids)
+
+    def search(self, query, k):
+        """(scores, faiss_ids) of the top-k chunks for ``query``; chunks with no matching term are left out."""
+        scores = np.zeros(len(self.faiss_ids), dtype="float32")
+        for term in tokenize(query):
+            i = self.vocab.get(term)
+            if i is None:
+                continue
+            start, end = self.indptr[i], self.indptr[i + 1]
+            scores[self.rows[start:end]] += self.weights[start:end]
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return scores[hits], self.faiss_ids[hits]
+
+    # -----------------------------------------------------------------
+    # Persistence
+    # -----------------------------------------------------------------
+    def save(self, emb_dir=EMB_DIR):
+        path = Path(emb_dir) / INDEX_NAME
+        tmp_path = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp_path, terms=self.terms, indptr=self.indptr, rows=self.rows,
+                 weights=self.weights, faiss_ids=self.faiss_ids)
+        tmp_path.replace(path)
+
+    @classmethod
+    def open(cls, emb_dir=EMB_DIR):
+        data = np.load(Path(emb_dir) / INDEX_NAME)
+        return cls(data["terms"], data["indptr"], data["rows"], data["weights"], data["faiss_ids"])
+
+
+def lexical_index_exists(emb_dir=EMB_DIR):
+    return (Path(emb_dir) / INDEX_NAME).exists()
+
+
+def build_from_chunk_store(emb_dir=EMB_DIR):
+    """(Re)build the BM25 index from the chunk store - cheap next to embedding."""
+    from chunk_store import ChunkStore
+
+    chunks = ChunkStore.open(emb_dir)
+    faiss_ids, texts = [], []
+    for fid, chunk in chunks.items():
+        faiss_ids.append(fid)
+        texts.append(chunk.text)
+    index = BM25Index.build(texts, faiss_ids)
+    index.save(emb_dir)
+    print(f"✅ BM25 index saved → {Path(emb_dir) / INDEX_NAME} ({len(index.terms)} terms, {len(index)} chunks)")
+    return index
+
+
+if __name__ == "__main__":
+    build_from_chunk_store()
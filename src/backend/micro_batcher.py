@@ -0,0 +1,100 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import tracing
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 5.0   # how long the first request of a batch waits for company
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Gather items submitted from many threads into batches for one ``fn(list) -> list`` call.
+
+    A batch closes when it holds max_batch_size items or max_wait_ms after its
+    first item arrived, whichever comes first; each caller gets its own result
+    (or the batch's exception) through the Future returned by submit().
+    """
+
+    def __init__(self, fn, name="batch", max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.fn = fn
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.full_batches = 0
+        self.largest_batch = 0
+        self._thread = threading.Thread(target=self._loop, name=f"{name}-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = first[2] + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                self._queue.put(_STOP)  # finish this batch, stop on the next get
+                break
+            batch.append(entry)
+        return batch
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = self._collect(first)
+
+            start = time.perf_counter()
+            for _, _, enqueued in batch:
+                tracing.observe(f"{self.name}.queue_wait", (start - enqueued) * 1000.0)
+            try:
+                results = self.fn([item for item, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            tracing.observe(f"{self.name}.run", (time.perf_counter() - start) * 1000.0)
+
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.full_batches += len(batch) == self.max_batch_size
+                self.largest_batch = max(self.largest_batch, len(batch))
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "full_batch_rate": self.full_batches / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+        }
@@ -0,0 +1,135 @@
+import threading
+import time
+from contextlib import contextmanager
+import embed_backend
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+# Models are loaded on first use and shared by every module in the process
+# (rag_bot_v2, generate_embeddings, mock, scoring), so importing any of them
+# costs nothing until an embedding is actually needed.
+DEFAULT_DEVICE = "cpu"
+
+_models = {}          # key -> loaded object
+_loaders = {}         # key -> zero-arg loader
+_locks = {}           # key -> lock held while loading
+_registry_lock = threading.Lock()
+
+_T0 = time.perf_counter()
+_startup = []         # (label, seconds) for the --profile-startup report
+
+
+# ---------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------
+def register(key, loader):
+    """Register a loader; nothing is loaded until get(key)."""
+    with _registry_lock:
+        _loaders.setdefault(key, loader)
+        _locks.setdefault(key, threading.Lock())
+
+
+def get(key):
+    """Loaded object for ``key``, loading it (once, thread-safe) on first call."""
+    model = _models.get(key)
+    if model is not None:
+        return model
+    with _locks[key]:
+        model = _models.get(key)
+        if model is None:
+            with timed(f"load {key}"):
+                model = _loaders[key]()
+            _models[key] = model
+    return model
+
+
+def is_loaded(key):
+    return key in _models
+
+
+def get_model(name, device=DEFAULT_DEVICE, backend=None):
+    """(tokenizer, model) for a Hugging Face encoder such as ModernBERT.
+
+    ``backend`` is one of embed_backend.BACKENDS (default: $EMBED_BACKEND or "torch").
+    """
+    backend = backend or embed_backend.DEFAULT_BACKEND
+    key = f"hf:{name}@{device}:{backend}"
+    if key not in _loaders:
+        register(key, lambda: embed_backend.load(name, device, backend))
+    return get(key)
+
+
+def get_tokenizer(name):
+    """Tokenizer alone - for processes that chunk locally but embed through embed_server.py."""
+    key = f"tok:{name}"
+    if key not in _loaders:
+        def load():
+            from transformers import AutoTokenizer
+            return AutoTokenizer.from_pretrained(name)
+        register(key, load)
+    return get(key)
+
+
+def get_sentence_transformer(name):
+    key = f"st:{name}"
+    if key not in _loaders:
+        def load():
+            from sentence_transformers import SentenceTransformer
+            print(f"📌 Loading {name} (sentence-transformers)...")
+            return SentenceTransformer(name)
+        register(key, load)
+    return get(key)
+
+
+def cross_encoder_key(name, device=DEFAULT_DEVICE):
+    return f"ce:{name}@{device}"
+
+
+def get_cross_encoder(name, device=DEFAULT_DEVICE):
+    """(tokenizer, model) for a sequence-classification cross-encoder (reranker.py)."""
+    key = cross_encoder_key(name, device)
+    if key not in _loaders:
+        def load():
+            from transformers import AutoTokenizer, AutoModelForSequenceClassification
+            print(f"📌 Loading {name} (cross-encoder, {device})...")
+            tokenizer = AutoTokenizer.from_pretrained(name)
+            model = AutoModelForSequenceClassification.from_pretrained(name).to(device)
+            model.eval()
+            return tokenizer, model
+        register(key, load)
+    return get(key)
+
+
+def warm_up(load_fn, *args):
+    """Load a model on a background daemon thread so the first query doesn't wait for it.
+
+    warm_up(get_model, "answerdotai/ModernBERT-base", "cpu", "onnx")
+    """
+    thread = threading.Thread(target=load_fn, args=args, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+# ---------------------------------------------------------------------
+# Startup profiling
+# ---------------------------------------------------------------------
+@contextmanager
+def timed(label):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _startup.append((label, time.perf_counter() - start))
+
+
+def record(label, seconds):
+    _startup.append((label, seconds))
+
+
+def startup_report():
+    lines = ["⏱️ Startup profile"]
+    for label, seconds in list(_startup):
+        lines.append(f"   {label:<50} {seconds * 1000:>9.1f} ms")
+    lines.append(f"   {'since model_registry import':<50} {(time.perf_counter() - _T0) * 1000:>9.1f} ms")
+    return "\n".join(lines)
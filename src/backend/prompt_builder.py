@@ -0,0 +1,117 @@
+import math
+from collections import namedtuple
+import numpy as np
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+CONTEXT_TOKENS = 1500       # input-token budget for retrieved context
+DEDUP_THRESHOLD = 0.95      # cosine between stored chunk vectors above which a chunk is a near-duplicate
+CHARS_PER_TOKEN = 3.5       # conservative for English with Claude's tokenizer
+MIN_OVERLAP_CHARS = 20      # shortest shared text treated as chunk overlap when merging
+
+PromptContext = namedtuple("PromptContext", ["context", "chunk_ids", "tokens", "dropped_duplicates"])
+
+
+def count_tokens(text):
+    """Estimated LLM tokens - no tokenizer round trip on the request path."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def chunk_index(chunk_id):
+    """nhsdoc3_2 -> 2 (None for ids without a numeric suffix)."""
+    suffix = chunk_id.rsplit("_", 1)[-1]
+    return int(suffix) if suffix.isdigit() else None
+
+
+def merge_texts(first, second):
+    """Join consecutive chunks, dropping the sentences they share (chunking overlap)."""
+    probe = second[:MIN_OVERLAP_CHARS]
+    if len(probe) == MIN_OVERLAP_CHARS:
+        pos = first.find(probe, max(0, len(first) - len(second)))
+        while pos != -1:
+            if second.startswith(first[pos:]):
+                return first[:pos] + second
+            pos = first.find(probe, pos + 1)
+    return first + "\n" + second
+
+
+def truncate_to_tokens(text, tokens):
+    """Cut text to roughly ``tokens``, at the last sentence end that fits if there is one."""
+    cut = text[:int(tokens * CHARS_PER_TOKEN)]
+    end = max(cut.rfind(". "), cut.rfind(".\n"))
+    return cut[:end + 1] if end > len(cut) // 2 else cut
+
+
+# ---------------------------------------------------------------------
+# Assembly
+# ---------------------------------------------------------------------
+def select(hits, vectors, max_chunks, budget, threshold=DEDUP_THRESHOLD):
+    """Greedy by rank: skip near-duplicates of an already chosen chunk, stop at max_chunks or budget.
+
+    ``hits`` are (faiss_id, Chunk) best first and ``vectors`` their stored,
+    L2-normalized embeddings (or None to skip deduplication).
+    """
+    chosen, chosen_rows, dropped = [], [], 0
+    used = 0
+    for row, (fid, chunk) in enumerate(hits):
+        if len(chosen) >= max_chunks:
+            break
+        if vectors is not None and chosen_rows:
+            if float(np.max(vectors[chosen_rows] @ vectors[row])) >= threshold:
+                dropped += 1
+                continue
+        cost = count_tokens(chunk.text)
+        if used + cost > budget:
+            if chosen:
+                continue  # a shorter, lower-ranked chunk may still fit
+            # the best chunk alone is over budget: keep its start
+            chunk = chunk._replace(text=truncate_to_tokens(chunk.text, budget))
+            cost = count_tokens(chunk.text)
+        chosen.append((fid, chunk))
+        chosen_rows.append(row)
+        used += cost
+    return chosen, dropped
+
+
+def merge_adjacent(chosen):
+    """Blocks of consecutive chunks of one document, each at the rank of its best member.
+
+    Returns [(header, text)] in rank order.
+    """
+    by_doc = {}
+    for rank, (_, chunk) in enumerate(chosen):
+        by_doc.setdefault(chunk.doc, []).append((rank, chunk))
+
+    blocks = []
+    for doc, members in by_doc.items():
+        members.sort(key=lambda m: (chunk_index(m[1].chunk_id) is None, chunk_index(m[1].chunk_id) or 0))
+        run = [members[0]]
+        for member in members[1:]:
+            prev_idx, idx = chunk_index(run[-1][1].chunk_id), chunk_index(member[1].chunk_id)
+            if prev_idx is not None and idx == prev_idx + 1:
+                run.append(member)
+            else:
+                blocks.append(_block(doc, run))
+                run = [member]
+        blocks.append(_block(doc, run))
+    blocks.sort(key=lambda b: b[0])
+    return [(header, text) for _, header, text in blocks]
+
+
+def _block(doc, run):
+    text = run[0][1].text
+    for _, chunk in run[1:]:
+        text = merge_texts(text, chunk.text)
+    ids = [chunk.chunk_id for _, chunk in run]
+    header = ids[0] if len(ids) == 1 else f"{ids[0]} … {ids[-1]}"
+    return min(rank for rank, _ in run), f"{header} ({doc})", text
+
+
+def assemble(hits, vectors, max_chunks, budget=CONTEXT_TOKENS, threshold=DEDUP_THRESHOLD):
+    """Context block for the prompt from ranked hits: dedupe, fill the token budget by rank, merge."""
+    chosen, dropped = select(hits, vectors, max_chunks, budget, threshold)
+    blocks = merge_adjacent(chosen)
+    context_blocks = [f"📄 {header}\n{text}" for header, text in blocks]
+    context = "\n\n---\n\n".join(context_blocks) if context_blocks else "No relevant retrieved chunks."
+    return PromptContext(context, [fid for fid, _ in chosen], count_tokens(context), dropped)
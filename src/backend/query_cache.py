@@ -0,0 +1,143 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+DEFAULT_MAX_MB = 64
+DEFAULT_TTL_SECONDS = 24 * 3600
+
+
+def normalize_query(text: str) -> str:
+    """'  Symptoms of   Dyslexia? ' -> 'symptoms of dyslexia'"""
+    text = " ".join(text.casefold().split())
+    return re.sub(r"[\s?!.]+$", "", text)
+
+
+# ---------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------
+class EmbeddingCache:
+    """Normalized query -> embedding, with LRU eviction under a memory budget and a TTL.
+
+    Thread-safe, since the bot embeds queries from a thread pool. ``fingerprint``
+    (e.g. the model name) is saved with the cache so a file written for another
+    model is ignored on load.
+    """
+
+    def __init__(self, max_mb=DEFAULT_MAX_MB, ttl_seconds=DEFAULT_TTL_SECONDS, path=None, fingerprint=""):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds
+        self.path = Path(path) if path else None
+        self.fingerprint = fingerprint
+        self._entries = OrderedDict()  # key -> (vector, created_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.path is not None and self.path.exists():
+            self.load()
+
+    @staticmethod
+    def _size(key, vec):
+        return vec.nbytes + len(key)
+
+    def _expired(self, created_at, now):
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def get(self, text):
+        key = normalize_query(text)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[1], now):
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, text, vec, created_at=None):
+        key = normalize_query(text)
+        vec = np.array(vec, dtype="float32")
+        vec.setflags(write=False)  # shared between callers
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (vec, time.time() if created_at is None else created_at)
+            self._bytes += self._size(key, vec)
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return vec
+
+    def get_or_compute(self, text, compute):
+        """Cached embedding for ``text``, calling ``compute(text)`` on a miss."""
+        vec = self.get(text)
+        if vec is None:
+            vec = self.put(text, compute(text))
+        return vec
+
+    def _drop(self, key):
+        vec, _ = self._entries.pop(key)
+        self._bytes -= self._size(key, vec)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    # -----------------------------------------------------------------
+    # Persistence
+    # -----------------------------------------------------------------
+    def save(self, path=None):
+        path = Path(path or self.path)
+        with self._lock:
+            keys = list(self._entries)
+            vecs = [self._entries[k][0] for k in keys]
+            created = [self._entries[k][1] for k in keys]
+        tmp_path = path.with_name(path.name + ".tmp.npz")
+        # every vector comes from the same embed function, so they stack
+        np.savez(
+            tmp_path,
+            fingerprint=np.array(self.fingerprint),
+            keys=np.array(keys, dtype=str),
+            created=np.array(created, dtype="float64"),
+            vectors=np.stack(vecs) if vecs else np.zeros((0,), dtype="float32"),
+        )
+        tmp_path.replace(path)
+        print(f"💾 Saved {len(keys)} cached query embeddings → {path}")
+
+    def load(self, path=None):
+        path = Path(path or self.path)
+        data = np.load(path)
+        if str(data["fingerprint"]) != self.fingerprint:
+            print(f"ℹ️ Ignoring query cache {path}: built for a different model")
+            return
+        now = time.time()
+        for key, created_at, vec in zip(data["keys"], data["created"], data["vectors"]):
+            if not self._expired(created_at, now):
+                self.put(str(key), vec, created_at=float(created_at))
+        print(f"📌 Loaded {len(self)} cached query embeddings from {path}")
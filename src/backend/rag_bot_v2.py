@@ -1,138 +1,357 @@
+import time
+_IMPORT_START = time.perf_counter()
 import os
+import argparse
+import asyncio
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import numpy as np
 from pathlib import Path
 import gradio as gr
 import faiss
-from transformers import AutoTokenizer, AutoModel
 import anthropic
 import torch
-import pandas as pd
-from datetime import datetime  # added for timestamped logging
+import logging
+import tracing
+import model_registry
+import embed_backend
+import grounding
+from embedding_store import EmbeddingStore, store_exists
+from chunk_store import ChunkStore, chunk_store_exists
+import index_factory
+import ingest_pipeline
+import lexical_index
+from reranker import Reranker
+from micro_batcher import MicroBatcher
+import prompt_builder
+from query_cache import EmbeddingCache
+from answer_cache import AnswerCache
+import atexit
+import hashlib
+import threading
+import weakref
+import snapshots
+from embed_client import client_for
+from collections import namedtuple
 
 # ==== Paths ====
 EMB_DIR = Path("embeddings")
-CHUNK_DIR = Path("chunks")
-EMB_DF_PATH = EMB_DIR / "all_embeddings.pkl"
 FAISS_PATH = EMB_DIR / "faiss_index.bin"
 
-# ==== Query embedding model ====
-tokenizer = AutoTokenizer.from_pretrained("answerdotai/ModernBERT-base")
-model = AutoModel.from_pretrained("answerdotai/ModernBERT-base")
-model.eval()
+# ==== Query embedding model (loaded on first query, or by --warmup) ====
+MODEL_NAME = "answerdotai/ModernBERT-base"
+EMBED_BACKEND = embed_backend.DEFAULT_BACKEND  # torch | int8 | onnx | onnx-int8
 
-# Anthropic client
+
+def get_model():
+    """(tokenizer, model), shared through model_registry."""
+    return model_registry.get_model(MODEL_NAME, backend=EMBED_BACKEND)
+
+
+# Set (from $EMBED_SERVER / --embed-server) to embed through embed_server.py instead of a local model
+embed_client = client_for(None)
+
+# Repeated questions skip the forward pass (resized / persisted from the command line)
+query_cache = EmbeddingCache(fingerprint=embed_backend.cache_fingerprint(MODEL_NAME, EMBED_BACKEND))
+
+# Anthropic clients (sync for scripts, async for the Gradio app)
 client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+async_client = anthropic.AsyncAnthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+LLM_MODEL = "claude-sonnet-4-20250514"
+MAX_TOKENS = 1024
 
+# ==== Serving limits (overridable from the command line) ====
+CONCURRENCY_LIMIT = 50   # chats in flight at once; the rest wait in the queue
+QUEUE_SIZE = 200         # queued chats before new ones are rejected
+SEARCH_WORKERS = 4       # threads for embedding + FAISS search
+BATCH_MAX_SIZE = 32      # queries embedded + searched together under load
+BATCH_WAIT_MS = 2.0      # how long a query waits for others to share its batch (0 disables batching)
+WORKERS = 0              # retrieval worker processes (0: retrieval runs on threads of this process)
+RELOAD_INTERVAL = 10.0   # seconds between checks for a newly published index snapshot (0 disables)
 
-def embed_text(text: str):
-    """Embed + normalize text for FAISS search."""
-    with torch.no_grad():
-        inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512, padding=True)
-        outputs = model(**inputs)
-        embeddings = outputs.last_hidden_state.mean(dim=1)
-        embeddings = embeddings / embeddings.norm(dim=1, keepdim=True)
-    return embeddings.numpy().astype("float32")
+# ==== Retrieval ====
+RETRIEVAL_MODES = ("hybrid", "dense", "lexical")
+RETRIEVAL_MODE = "hybrid"   # hybrid: BM25 + FAISS fused by reciprocal rank; keyword queries skip the model
+HYBRID_CANDIDATES = 20      # results taken from each retriever before fusion
 
+CONTEXT_TOKENS = prompt_builder.CONTEXT_TOKENS   # input-token budget for retrieved context
 
-def load_index_and_count():
-    """Load FAISS index and return how many embeddings exist."""
-    if not FAISS_PATH.exists() or not EMB_DF_PATH.exists():
-        print("❌ Missing embeddings files.")
-        return None, 0
+# Wide candidate set reordered by a cross-encoder; falls back to retrieval order past its budget
+reranker = Reranker()
 
-    print("📌 Loading FAISS index + metadata...")
-    index = faiss.read_index(str(FAISS_PATH))
-    df = pd.read_pickle(EMB_DF_PATH)
-    total = df.shape[0]
+search_pool = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+# Concurrent dense queries share one forward pass + one index.search (set up in main)
+query_batcher = None
+# --workers N: retrieval + grounding run in N processes sharing the mmap'd index (set up in main)
+worker_pool = None
 
-    print(f"✅ Loaded FAISS index + {total} chunk embeddings")
-    return index, total
+# Near-duplicate questions over the same chunks reuse an earlier answer
+answer_cache = AnswerCache()
 
+NO_INDEX_MESSAGE = "⚠️ No embeddings available. Run embedding generation first."
+API_ERROR_MESSAGE = "⚠️ Error communicating with Anthropic API. See server logs."
 
-def retrieve_context(query, index, total_chunks, top_k=3):
-    """Search for top_k similar chunks and return text contents."""
-    print(f"[{datetime.utcnow().isoformat()}] retrieve_context ENTER: query_len={len(query) if query else 0}, top_k={top_k}, total_chunks={total_chunks}")
 
-    if index is None:
-        print(f"[{datetime.utcnow().isoformat()}] retrieve_context: index is None")
-        return "No index available."
+def embed_text(text: str):
+    """Embed + normalize text for FAISS search, served from the query cache when possible."""
+    vec = query_cache.get(text)
+    tracing.annotate(query_cache_hit=vec is not None)
+    if vec is None:
+        vec = query_cache.put(text, _embed_text_uncached(text))
+    return vec
+
+
+def embed_texts(texts, max_length=grounding.MAX_PARAGRAPH_TOKENS, timings=None):
+    """Embed several texts in one padded pass (mean over real tokens), L2-normalized rows.
+
+    ``timings`` (a dict) receives the ms spent per stage, named like retrieve()'s spans.
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    if embed_client is not None:
+        embeddings = embed_client.embed(MODEL_NAME, texts, backend=EMBED_BACKEND, max_length=max_length)
+        timings["embed_server"] = (time.perf_counter() - start) * 1000.0
+        return embeddings
+    tokenizer, model = get_model()
+    with torch.no_grad():
+        start = time.perf_counter()
+        inputs = tokenizer(texts, return_tensors="pt", truncation=True,
+                           max_length=max_length, padding=True)
+        timings["tokenize"] = (time.perf_counter() - start) * 1000.0
+        start = time.perf_counter()
+        outputs = model(**inputs)
+        mask = inputs["attention_mask"].unsqueeze(-1).to(outputs.last_hidden_state.dtype)
+        embeddings = (outputs.last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1)
+        embeddings = embeddings / embeddings.norm(dim=1, keepdim=True)
+        timings["forward_pass"] = (time.perf_counter() - start) * 1000.0
+    return embeddings.numpy().astype("float32")
 
-    # 1) Embed the query with error handling
-    print('KAI 3: querying FAISS')
-    try:
-        query_vec = embed_text(query)
-        print(f"[{datetime.utcnow().isoformat()}] embed_text returned type={type(query_vec)} shape={getattr(query_vec,'shape',None)} dtype={getattr(query_vec,'dtype',None)}")
-    except Exception as e:
-        print(f"[{datetime.utcnow().isoformat()}] embed_text ERROR: {e}")
-        raise
-    print('KAI 4: querying FAISS done')
 
-    # 2) Ensure query_vec is 2D float32 contiguous array expected by FAISS
-    try:
-        if isinstance(query_vec, np.ndarray):
-            if query_vec.ndim == 1:
-                query_vec = query_vec.reshape(1, -1)
-            query_vec = np.ascontiguousarray(query_vec, dtype="float32")
-        else:
-            print(f"[{datetime.utcnow().isoformat()}] Warning: query_vec unexpected type {type(query_vec)} - attempting conversion")
-            query_vec = np.ascontiguousarray(np.array(query_vec, dtype="float32").reshape(1, -1))
-        print(f"[{datetime.utcnow().isoformat()}] query_vec normalized shape={query_vec.shape} dtype={query_vec.dtype} contiguous={query_vec.flags['C_CONTIGUOUS']}")
-    except Exception as e:
-        print(f"[{datetime.utcnow().isoformat()}] query_vec normalization ERROR: {e}")
-        raise
+def _embed_text_uncached(text: str):
+    if embed_client is not None:
+        with tracing.span("embed_server"):
+            return embed_client.embed(MODEL_NAME, [text], backend=EMBED_BACKEND, max_length=512)
+    with tracing.span("model_load"):
+        tokenizer, model = get_model()
+    with torch.no_grad():
+        with tracing.span("tokenize"):
+            inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512, padding=True)
+        with tracing.span("forward_pass"):
+            outputs = model(**inputs)
+            embeddings = outputs.last_hidden_state.mean(dim=1)
+            embeddings = embeddings / embeddings.norm(dim=1, keepdim=True)
+    return embeddings.numpy().astype("float32")
 
-    # 3) Call FAISS index.search with error handling and debug prints
-    try:
-        print(f"[{datetime.utcnow().isoformat()}] Calling index.search(top_k={top_k})...")
-        D, I = index.search(query_vec, top_k)
-        print(f"[{datetime.utcnow().isoformat()}] index.search returned D.shape={getattr(D,'shape',None)} I.shape={getattr(I,'shape',None)}")
-    except Exception as e:
-        print(f"[{datetime.utcnow().isoformat()}] index.search ERROR: {e}")
-        raise
 
-    # 4) Iterate results with detailed logs and robust checks
-    context_blocks = []
-    try:
-        row = I[0] if (hasattr(I, "__len__") and len(I) > 0) else I
-        for pos, raw_idx in enumerate(row):
+def embed_and_search(requests):
+    """MicroBatcher fn: [(query, cached_vec or None, index, k)] -> [(query_vec, faiss ids, batch size, stages)].
+
+    Cache misses share one padded forward pass (masked mean, so each row equals
+    the single-query embedding); queries against the same index share one search.
+    stages maps tokenize / forward_pass / faiss_search to the batch's ms, observed
+    here once per batch as the query_batch.* histograms.
+    """
+    stages = {}
+    vecs = [vec for _, vec, _, _ in requests]
+    misses = [i for i, vec in enumerate(vecs) if vec is None]
+    if misses:
+        fresh = embed_texts([requests[i][0] for i in misses], max_length=512, timings=stages)
+        for i, row in zip(misses, fresh):
+            vecs[i] = query_cache.put(requests[i][0], row.reshape(1, -1))
+
+    results = [None] * len(requests)
+    by_index = {}
+    for i, (_, _, index, _) in enumerate(requests):
+        by_index.setdefault(id(index), []).append(i)
+    start = time.perf_counter()
+    for members in by_index.values():
+        index = requests[members[0]][2]
+        matrix = np.ascontiguousarray(np.vstack([vecs[i] for i in members]), dtype="float32")
+        _, I = index.search(matrix, max(requests[i][3] for i in members))
+        for row, i in enumerate(members):
+            results[i] = (matrix[row:row + 1], I[row:row + 1, :requests[i][3]], len(requests), stages)
+    stages["faiss_search"] = (time.perf_counter() - start) * 1000.0
+
+    for name, ms in stages.items():
+        tracing.observe(f"query_batch.{name}", ms)
+    return results
+
+
+Retrieval = namedtuple("Retrieval", ["query_vec", "chunk_ids", "context", "version"])
+
+# Everything retrieval reads, loaded together from one index snapshot. A request
+# keeps the Snapshot it started with, so a swap never mixes two versions and the
+# old one is freed when its last request finishes.
+#   embeddings: stored chunk vectors (memory-mapped), for dedup + grounding scores
+#   bm25: BM25 index over the same chunks (None when generate_embeddings hasn't built one yet)
+Snapshot = namedtuple("Snapshot", ["version", "index", "chunks", "embeddings", "bm25"])
+
+# The snapshot new requests use; replaced whole by swap_snapshot()
+active = None
+
+
+def index_version():
+    """Version of an unpublished index: changes whenever generate_embeddings rewrites the file."""
+    stat = FAISS_PATH.stat()
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def load_snapshot(version=None, use_mmap=False, mmap_index=False):
+    """Load a published snapshot (default: CURRENT), or embeddings/ itself before the first publish."""
+    version = version or snapshots.current_version(EMB_DIR)
+    src = snapshots.snapshot_dir(version, EMB_DIR) if version else EMB_DIR
+    faiss_path = src / FAISS_PATH.name
+    if not faiss_path.exists() or not store_exists(src) or not chunk_store_exists(src):
+        print(f"❌ Missing embeddings files in {src}.")
+        return None
+
+    print(f"📌 Loading FAISS index + chunk store{f' (snapshot {version})' if version else ''}...")
+    index = index_factory.load_index(faiss_path, src, mmap=mmap_index)
+    chunks = ChunkStore.open(src, use_mmap=use_mmap)
+    embeddings = EmbeddingStore.open(src)
+    bm25 = None
+    if lexical_index.lexical_index_exists(src):
+        bm25 = lexical_index.BM25Index.open(src)
+    else:
+        print("ℹ️ No BM25 index yet (run generate_embeddings) — dense retrieval only")
+
+    print(f"✅ Loaded FAISS index ({index_factory.describe(index)}) + {len(chunks)} chunks"
+          f"{' + BM25' if bm25 is not None else ''}")
+    return Snapshot(version or index_version(), index, chunks, embeddings, bm25)
+
+
+def swap_snapshot(snap):
+    """Make ``snap`` the one new requests use; in-flight requests finish on the old one."""
+    global active
+    old, active = active, snap
+    # Cached answers are only valid for the index they were retrieved from
+    answer_cache.set_index_version(snap.version)
+    if old is not None:
+        tracing.log(logging.INFO, "snapshot_swapped", old=old.version, new=snap.version)
+        weakref.finalize(old.chunks, tracing.log, logging.INFO, "snapshot_released", version=old.version)
+
+
+def watch_snapshots(interval, use_mmap=False, mmap_index=False):
+    """Daemon thread: load each newly published snapshot off the request path, then swap it in."""
+    def loop():
+        failed = None
+        while True:
+            time.sleep(interval)
+            version = snapshots.current_version(EMB_DIR)
+            if version is None or version == failed or (active is not None and version == active.version):
+                continue
+            start = time.perf_counter()
             try:
-                print(f"[{datetime.utcnow().isoformat()}] result[{pos}] raw_idx={raw_idx} type={type(raw_idx)}")
-                if not isinstance(raw_idx, (int, np.integer)):
-                    raw_idx = int(raw_idx)
-                if raw_idx < 0 or raw_idx >= total_chunks:
-                    print(f"[{datetime.utcnow().isoformat()}] Skipping out-of-range idx={raw_idx}")
-                    continue
-                chunk_path = CHUNK_DIR / f"{raw_idx}.txt"
-                exists = chunk_path.exists()
-                print(f"[{datetime.utcnow().isoformat()}] chunk_path={chunk_path} exists={exists}")
-                if exists:
-                    chunk_text = chunk_path.read_text()
-                    context_blocks.append(f"📄 Chunk {raw_idx}\n{chunk_text}")
-            except Exception as inner_e:
-                print(f"[{datetime.utcnow().isoformat()}] Error processing result[{pos}]: {inner_e}")
+                snap = load_snapshot(version, use_mmap=use_mmap, mmap_index=mmap_index)
+                if snap is None:
+                    raise FileNotFoundError(f"incomplete snapshot {version}")
+            except Exception as e:
+                failed = version  # keep serving the old one; retry when a newer one is published
+                tracing.log(logging.ERROR, "snapshot_load_failed", version=version, error=repr(e))
                 continue
-    except Exception as e:
-        print(f"[{datetime.utcnow().isoformat()}] Error iterating search results: {e}")
-        raise
+            # a runtime cost, so not in model_registry's startup profile
+            load_ms = (time.perf_counter() - start) * 1000.0
+            tracing.observe("snapshot_load", load_ms)
+            tracing.log(logging.INFO, "snapshot_loaded", version=version, load_ms=round(load_ms, 3))
+            swap_snapshot(snap)
+    threading.Thread(target=loop, name="snapshot-watcher", daemon=True).start()
+
+
+def retrieve(query, snap, top_k=3):
+    """Search ``snap`` for top_k similar chunks; returns Retrieval(query_vec, chunk_ids, context, version).
+
+    The context holds at most top_k chunks within CONTEXT_TOKENS, near-duplicates
+    dropped and neighbouring chunks of one document merged (prompt_builder.py).
+    """
+    if snap is None:
+        tracing.log(logging.WARNING, "retrieve_no_index")
+        return Retrieval(None, [], "No index available.", None)
+    index, chunks = snap.index, snap.chunks
+    tracing.annotate(snapshot=snap.version)
+
+    lexical = snap.bm25 if RETRIEVAL_MODE != "dense" else None
+    rerank = reranker.enabled
+    if lexical is not None and (RETRIEVAL_MODE == "lexical" or lexical_index.looks_like_keywords(query, lexical)):
+        # Keyword query: BM25 alone, no transformer pass (so no reranking either)
+        query_vec = None
+        with tracing.span("bm25_search"):
+            _, ranked = lexical.search(query, 2 * top_k)
+        mode = "lexical"
+        rerank = False
+    else:
+        n_candidates = top_k
+        if lexical is not None:
+            n_candidates = max(n_candidates, HYBRID_CANDIDATES)
+        if rerank:
+            n_candidates = max(n_candidates, reranker.candidates)
+
+        if query_batcher is not None:
+            cached = query_cache.get(query)
+            tracing.annotate(query_cache_hit=cached is not None)
+            with tracing.span("batched_embed_search"):
+                future = query_batcher.submit((query, cached, index, n_candidates))
+                query_vec, I, batch_size, stages = future.result()
+            # the batch's stage times, as fields only: query_batch.* histograms count each batch once
+            tracing.annotate(batched=True, batch_size=batch_size,
+                             batch_stages_ms={name: round(ms, 3) for name, ms in stages.items()})
+        else:
+            query_vec = embed_text(query)
+
+            # FAISS expects a 2D float32 contiguous array
+            query_vec = np.ascontiguousarray(np.asarray(query_vec, dtype="float32").reshape(1, -1))
+            with tracing.span("faiss_search"):
+                D, I = index.search(query_vec, n_candidates)
+        ranked = I[0]
+        mode = "dense"
+        if lexical is not None:
+            with tracing.span("bm25_search"):
+                _, lexical_ranked = lexical.search(query, n_candidates)
+            if len(lexical_ranked):
+                ranked = lexical_index.reciprocal_rank_fusion(
+                    [[int(i) for i in I[0] if i >= 0], [int(i) for i in lexical_ranked]])
+                mode = "hybrid"
+        if not rerank:
+            # a few spares to backfill chunks dropped as near-duplicates
+            ranked = ranked[:2 * top_k]
+
+    hits = []
+    with tracing.span("chunk_lookup"):
+        for raw_idx in ranked:
+            # FAISS ids are stable across incremental updates, so they can exceed
+            # the chunk count; -1 marks "fewer than top_k results"
+            if raw_idx < 0:
+                continue
+            chunk = chunks.get(raw_idx)
+            if chunk is None:
+                tracing.log(logging.WARNING, "chunk_missing", faiss_id=int(raw_idx))
+                continue
+            hits.append((int(raw_idx), chunk))
 
-    context = "\n\n---\n\n".join(context_blocks) if context_blocks else "No relevant retrieved chunks."
-    print(f"[{datetime.utcnow().isoformat()}] Retrieved context (chars={len(context)}) blocks={len(context_blocks)}")
-    return context
+    if rerank and len(hits) > top_k:
+        with tracing.span("rerank"):
+            order = reranker.rerank(query, [chunk.text for _, chunk in hits])
+        tracing.annotate(rerank="ok" if order is not None else "fallback", rerank_candidates=len(hits))
+        if order is not None:
+            hits = [hits[i] for i in order]
 
+    with tracing.span("context_build"):
+        vectors = None
+        if snap.embeddings is not None and hits:
+            vectors = snap.embeddings.vectors_for_ids([fid for fid, _ in hits])
+        built = prompt_builder.assemble(hits, vectors, max_chunks=top_k, budget=CONTEXT_TOKENS)
 
-def chat(message, history, index, total_chunks):
-    if index is None:
-        print(f"[{datetime.utcnow().isoformat()}] Attempted chat but embeddings index missing.")
-        return "⚠️ No embeddings available. Run embedding generation first."
+    tracing.annotate(top_k=top_k, hits=len(built.chunk_ids), context_chars=len(built.context),
+                     context_tokens=built.tokens, duplicates_dropped=built.dropped_duplicates, retrieval=mode)
+    return Retrieval(query_vec, built.chunk_ids, built.context, snap.version)
 
-    # log start of chat handling
-    print(f"[{datetime.utcnow().isoformat()}] Starting chat handling for message: {message!r}")
-    print('\t\t\tKAI1')
 
-    context = retrieve_context(message, index, total_chunks)
-    print('\t\t\tKAI2')
+def retrieve_context(query, snap, top_k=3):
+    """Search for top_k similar chunks and return text contents."""
+    return retrieve(query, snap, top_k).context
+
 
-    prompt = f"""
+def build_prompt(context, message):
+    return f"""
 You are a helpful assistant answering questions using the retrieved context.
 
 Context:
@@ -143,36 +362,365 @@ User Question: {message}
 If the context is not relevant, say so.
 """
 
-    # Log that we'll call the Anthropic API
-    print(f"[{datetime.utcnow().isoformat()}] Making Anthropic API call...")
 
+def prompt_fingerprint():
+    """Hash of everything besides the question + retrieved chunks that shapes an answer."""
+    template = build_prompt("{context}", "{message}")
+    key = f"{LLM_MODEL}|{MAX_TOKENS}|{CONTEXT_TOKENS}|{template}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def grounding_scores(answer, retrieval, trace, snap):
+    """[(paragraph, max similarity to the retrieved chunks' stored vectors)] ([] if scoring fails)."""
+    if snap is None or snap.embeddings is None or not retrieval.chunk_ids or snap.version != retrieval.version:
+        return []
+    try:
+        with trace.span("grounding"):
+            chunk_vecs = snap.embeddings.vectors_for_ids(retrieval.chunk_ids)
+            return grounding.score_answer(answer, chunk_vecs, embed_texts)
+    except Exception as e:
+        # the answer has already streamed; losing its scores must not turn it into an error
+        tracing.log(logging.ERROR, "grounding_failed", error=repr(e))
+        return []
+
+
+# ---------------------------------------------------------------------
+# Worker processes (--workers N)
+# ---------------------------------------------------------------------
+# Each worker has its own model and GIL; the FAISS index, embedding matrix and
+# chunk blob are memory-mapped files, so the page cache holds one copy per host.
+# Workers watch for new snapshots themselves.
+def init_worker(args, threads, started):
+    """Process-pool initializer: apply the CLI settings, cap threads, map the index files."""
+    global EMBED_BACKEND, RETRIEVAL_MODE, CONTEXT_TOKENS, query_cache, reranker, embed_client
+    torch.set_num_threads(threads)
+    faiss.omp_set_num_threads(threads)
+    tracing.configure(level=args.log_level, sample_rate=args.trace_sample)
+    EMBED_BACKEND = args.embed_backend
+    RETRIEVAL_MODE = args.retrieval
+    CONTEXT_TOKENS = args.context_tokens
+    embed_client = client_for(args.embed_server)
+    query_cache = EmbeddingCache(max_mb=args.query_cache_mb, ttl_seconds=args.query_cache_ttl,
+                                 fingerprint=embed_backend.cache_fingerprint(MODEL_NAME, EMBED_BACKEND))
+    reranker = Reranker(model_name=args.rerank_model, candidates=args.rerank_candidates,
+                        budget_ms=args.rerank_budget_ms)
+    swap_snapshot(load_snapshot(use_mmap=True, mmap_index=True))
+    if args.reload_interval > 0:
+        watch_snapshots(args.reload_interval, use_mmap=True, mmap_index=True)
+    if args.warmup:
+        if embed_client is None:
+            get_model()
+        if reranker.enabled:
+            reranker.load()
+    started.release()
+
+
+def worker_ready(_):
+    return os.getpid()
+
+
+def worker_retrieve(message):
+    """retrieve() in a worker; span timings and annotations travel back with the result."""
+    trace = tracing.Trace("retrieve")
+    with tracing.activate(trace):
+        retrieval = retrieve(message, active)
+    trace.annotate(worker_pid=os.getpid())
+    return tuple(retrieval), trace.spans, trace.fields
+
+
+def worker_grounding(answer, chunk_ids, version):
+    return grounding_scores(answer, Retrieval(None, chunk_ids, "", version), tracing.Trace("grounding"), active)
+
+
+def start_workers(args):
+    """Spawn the worker pool, splitting this host's cores between the workers."""
+    threads = max(1, ingest_pipeline.available_cores() // args.workers)
+    # inherited by the spawned workers before they import torch / faiss
+    os.environ["OMP_NUM_THREADS"] = os.environ["MKL_NUM_THREADS"] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    ctx = multiprocessing.get_context("spawn")  # never fork a process holding torch threads
+    started = ctx.Semaphore(0)
+    pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx,
+                               initializer=init_worker, initargs=(args, threads, started))
+    # one task per worker makes the pool start them all now rather than on the first queries
+    ready = [pool.submit(worker_ready, None) for _ in range(args.workers)]
+    for _ in range(args.workers):
+        while not started.acquire(timeout=1.0):
+            failed = [f for f in ready if f.done() and f.exception() is not None]
+            if failed:
+                raise failed[0].exception()  # an initializer failed: the pool is broken
+    print(f"✅ {args.workers} retrieval worker(s) up, {threads} thread(s) each")
+    return pool
+
+
+async def retrieve_async(message, snap, trace):
+    """retrieve() off the event loop: on the search threads, or in a worker process."""
+    loop = asyncio.get_running_loop()
+    if worker_pool is None:
+        # ModernBERT + FAISS are CPU bound and release the GIL, so they get real threads
+        return await loop.run_in_executor(
+            search_pool, tracing.run_in_trace, trace, retrieve, message, snap)
+    fields, spans, annotations = await loop.run_in_executor(worker_pool, worker_retrieve, message)
+    for name, ms in spans.items():
+        trace.record(name, ms)
+    trace.annotate(**annotations)
+    return Retrieval(*fields)
+
+
+async def grounding_scores_async(answer, retrieval, trace, snap):
+    """grounding_scores() off the event loop: on the search threads, or in a worker process."""
+    if not retrieval.chunk_ids:
+        return []
+    loop = asyncio.get_running_loop()
+    if worker_pool is None:
+        # paragraph embedding (or a blocking embed_server call) must not stall other streams
+        return await loop.run_in_executor(
+            search_pool, tracing.run_in_trace, trace, grounding_scores, answer, retrieval, trace, snap)
+    try:
+        with trace.span("grounding"):
+            return await loop.run_in_executor(worker_pool, worker_grounding, answer, retrieval.chunk_ids,
+                                              retrieval.version)
+    except Exception as e:
+        tracing.log(logging.ERROR, "grounding_failed", error=repr(e))
+        return []
+
+
+def stream_error(e, partial):
+    """Error text for a failed stream, keeping whatever already reached the user."""
+    tracing.log(logging.ERROR, "anthropic_error", error=repr(e), partial_chars=len(partial))
+    if partial:
+        return f"{partial}\n\n{API_ERROR_MESSAGE}"
+    return API_ERROR_MESSAGE
+
+
+def chat(message, history, snap):
+    """Yield the answer accumulated so far, as tokens stream in from Anthropic.
+
+    After a successful answer the last item is a list of (paragraph, grounding
+    score) pairs (see grounding.py) instead of a string.
+    """
+    if snap is None:
+        tracing.log(logging.WARNING, "chat_no_index")
+        yield NO_INDEX_MESSAGE
+        return
+
+    trace = tracing.Trace("chat", message_chars=len(message))
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1024,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        # Try to extract text similarly to existing code; fall back to string conversion
+        with tracing.activate(trace):
+            retrieval = retrieve(message, snap)
+
+        # a request that started just before a swap neither reads nor fills the new version's cache
+        cacheable = retrieval.version == answer_cache.index_version
+        cached = answer_cache.lookup(message, retrieval.query_vec, retrieval.chunk_ids, prompt_fingerprint()) \
+            if cacheable else None
+        trace.annotate(answer_cache_hit=cached is not None)
+        if cached is not None:
+            yield cached
+            yield grounding_scores(cached, retrieval, trace, snap) or cached
+            return
+
+        with trace.span("prompt_build"):
+            prompt = build_prompt(retrieval.context, message)
+
+        llm_start = time.perf_counter()
+        resp_text = ""
         try:
-            resp_text = response.content[0].text
-        except Exception:
-            resp_text = str(response)
+            with trace.span("llm_call"), client.messages.stream(
+                model=LLM_MODEL,
+                max_tokens=MAX_TOKENS,
+                messages=[{"role": "user", "content": prompt}]
+            ) as stream:
+                for text in stream.text_stream:
+                    if not resp_text:
+                        trace.record("llm_first_token", (time.perf_counter() - llm_start) * 1000.0)
+                    resp_text += text
+                    yield resp_text
+            trace.annotate(response_chars=len(resp_text))
+            if cacheable:
+                answer_cache.store(message, retrieval.query_vec, retrieval.chunk_ids, prompt_fingerprint(), resp_text)
+            yield grounding_scores(resp_text, retrieval, trace, snap) or resp_text
+        except Exception as e:
+            trace.finish(error=e)
+            yield stream_error(e, resp_text)
+    except Exception as e:
+        trace.finish(error=e)
+        raise
+    finally:
+        trace.finish()
 
-        # log response received (truncate to avoid overwhelming terminal)
-        max_print = 2000
-        print(f"[{datetime.utcnow().isoformat()}] Anthropic response received (chars={len(resp_text)}).")
-        print(f"[{datetime.utcnow().isoformat()}] Response preview: {resp_text[:max_print]!s}")
 
-        return resp_text
+async def chat_async(message, history, snap):
+    """chat() for the event loop: retrieval runs on the search pool, the LLM stream is awaited."""
+    if snap is None:
+        tracing.log(logging.WARNING, "chat_no_index")
+        yield NO_INDEX_MESSAGE
+        return
+
+    trace = tracing.Trace("chat", message_chars=len(message))
+    try:
+        retrieval = await retrieve_async(message, snap, trace)
+
+        # a request that started just before a swap neither reads nor fills the new version's cache
+        cacheable = retrieval.version == answer_cache.index_version
+        cached = answer_cache.lookup(message, retrieval.query_vec, retrieval.chunk_ids, prompt_fingerprint()) \
+            if cacheable else None
+        trace.annotate(answer_cache_hit=cached is not None)
+        if cached is not None:
+            yield cached
+            yield await grounding_scores_async(cached, retrieval, trace, snap) or cached
+            return
+
+        with trace.span("prompt_build"):
+            prompt = build_prompt(retrieval.context, message)
+
+        llm_start = time.perf_counter()
+        resp_text = ""
+        try:
+            with trace.span("llm_call"):
+                async with async_client.messages.stream(
+                    model=LLM_MODEL,
+                    max_tokens=MAX_TOKENS,
+                    messages=[{"role": "user", "content": prompt}]
+                ) as stream:
+                    async for text in stream.text_stream:
+                        if not resp_text:
+                            trace.record("llm_first_token", (time.perf_counter() - llm_start) * 1000.0)
+                        resp_text += text
+                        yield resp_text
+            trace.annotate(response_chars=len(resp_text))
+            if cacheable:
+                answer_cache.store(message, retrieval.query_vec, retrieval.chunk_ids, prompt_fingerprint(), resp_text)
+            yield await grounding_scores_async(resp_text, retrieval, trace, snap) or resp_text
+        except Exception as e:
+            trace.finish(error=e)
+            yield stream_error(e, resp_text)
     except Exception as e:
-        print(f"[{datetime.utcnow().isoformat()}] Error calling Anthropic API: {e}")
-        return "⚠️ Error communicating with Anthropic API. See server logs."
+        trace.finish(error=e)
+        raise
+    finally:
+        trace.finish()
 
 
 if __name__ == "__main__":
-    index, total_chunks = load_index_and_count()
-    if index is None:
+    parser = argparse.ArgumentParser(description="RAG chatbot over the FAISS index")
+    parser.add_argument("--mmap-chunks", action="store_true",
+                        help="memory-map the chunk store instead of reading it into RAM")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY_LIMIT,
+                        help="chats handled concurrently")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE,
+                        help="max queued chats before new ones are turned away")
+    parser.add_argument("--search-workers", type=int, default=SEARCH_WORKERS,
+                        help="threads for query embedding + FAISS search")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="retrieval worker processes sharing one memory-mapped index (0: threads only)")
+    parser.add_argument("--reload-interval", type=float, default=RELOAD_INTERVAL,
+                        help="seconds between checks for a new index snapshot from generate_embeddings (0 disables)")
+    parser.add_argument("--batch-max-size", type=int, default=BATCH_MAX_SIZE,
+                        help="max concurrent queries embedded + searched in one batch")
+    parser.add_argument("--batch-wait-ms", type=float, default=BATCH_WAIT_MS,
+                        help="how long a query waits for others to batch with (0 disables batching)")
+    parser.add_argument("--query-cache-mb", type=float, default=query_cache.max_bytes / 2**20,
+                        help="memory budget of the query embedding cache")
+    parser.add_argument("--query-cache-ttl", type=float, default=query_cache.ttl_seconds,
+                        help="seconds before a cached query embedding expires")
+    parser.add_argument("--query-cache-path", type=Path,
+                        help="persist the query embedding cache to this .npz across restarts")
+    parser.add_argument("--answer-cache-threshold", type=float, default=answer_cache.threshold,
+                        help="cosine similarity above which a previous answer is reused for a different "
+                             "question (default >1: only repeats of the same question)")
+    parser.add_argument("--answer-cache-size", type=int, default=answer_cache.max_entries,
+                        help="answers kept in the answer cache (0 disables)")
+    parser.add_argument("--answer-cache-ttl", type=float, default=answer_cache.ttl_seconds,
+                        help="seconds before a cached answer expires")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="level of the JSON log records")
+    parser.add_argument("--trace-sample", type=float, default=1.0,
+                        help="fraction of successful request traces to log (errors are always logged)")
+    parser.add_argument("--metrics-port", type=int, default=9100,
+                        help="serve /metrics and /metrics.json on this localhost port (0 disables)")
+    parser.add_argument("--embed-backend", choices=embed_backend.BACKENDS, default=EMBED_BACKEND,
+                        help="query embedding backend (check drift first with bench_embed.py)")
+    parser.add_argument("--embed-server", default=None,
+                        help="embed queries + answers through embed_server.py at this URL (default: $EMBED_SERVER)")
+    parser.add_argument("--retrieval", choices=RETRIEVAL_MODES, default=RETRIEVAL_MODE,
+                        help="hybrid (BM25 + dense, keyword queries BM25 only), dense, or lexical")
+    parser.add_argument("--rerank-model", default=reranker.model_name,
+                        help="cross-encoder used to rerank retrieved chunks")
+    parser.add_argument("--rerank-candidates", type=int, default=reranker.candidates,
+                        help="chunks retrieved for reranking (0 disables reranking)")
+    parser.add_argument("--rerank-budget-ms", type=float, default=reranker.budget_ms,
+                        help="per-query reranking budget; past it the retrieval order is used")
+    parser.add_argument("--context-tokens", type=int, default=CONTEXT_TOKENS,
+                        help="token budget for retrieved context in the prompt")
+    parser.add_argument("--warmup", action="store_true",
+                        help="load the embedding (and rerank) model on a background thread right after startup")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print import / index / model load times")
+    args = parser.parse_args()
+    model_registry.record("imports", time.perf_counter() - _IMPORT_START)
+    EMBED_BACKEND = args.embed_backend
+    RETRIEVAL_MODE = args.retrieval
+    CONTEXT_TOKENS = args.context_tokens
+    embed_client = client_for(args.embed_server)
+
+    tracing.configure(level=args.log_level, sample_rate=args.trace_sample)
+    tracing.register_stats("query_cache", lambda: query_cache.stats())
+    tracing.register_stats("answer_cache", lambda: answer_cache.stats())
+    tracing.register_stats("rerank", lambda: reranker.stats())
+    if args.metrics_port:
+        try:
+            tracing.start_metrics_server(args.metrics_port)
+            print(f"📈 Metrics on http://127.0.0.1:{args.metrics_port}/metrics")
+        except OSError as e:
+            # e.g. node_exporter already on 9100: metrics are optional, the bot is not
+            tracing.log(logging.WARNING, "metrics_server_failed", port=args.metrics_port, error=repr(e))
+            print(f"⚠️ Metrics endpoint disabled: port {args.metrics_port} unavailable ({e.strerror or e})")
+
+    answer_cache = AnswerCache(threshold=args.answer_cache_threshold, max_entries=args.answer_cache_size,
+                               ttl_seconds=args.answer_cache_ttl)
+    query_cache = EmbeddingCache(max_mb=args.query_cache_mb, ttl_seconds=args.query_cache_ttl,
+                                 path=args.query_cache_path,
+                                 fingerprint=embed_backend.cache_fingerprint(MODEL_NAME, EMBED_BACKEND))
+    if args.query_cache_path:
+        atexit.register(query_cache.save)
+
+    reranker = Reranker(model_name=args.rerank_model, candidates=args.rerank_candidates,
+                        budget_ms=args.rerank_budget_ms)
+
+    search_workers = args.search_workers
+    if args.workers == 0 and args.batch_wait_ms > 0 and args.batch_max_size > 1:
+        query_batcher = MicroBatcher(embed_and_search, name="query_batch", max_batch_size=args.batch_max_size,
+                                     max_wait_ms=args.batch_wait_ms)
+        tracing.register_stats("query_batch", lambda: query_batcher.stats())
+        # search threads mostly wait on the batcher, so there must be enough of them to fill a batch
+        search_workers = max(search_workers, args.batch_max_size)
+    if search_workers != SEARCH_WORKERS:
+        search_pool = ThreadPoolExecutor(max_workers=search_workers, thread_name_prefix="search")
+
+    use_mmap, mmap_index = args.mmap_chunks or args.workers > 0, args.workers > 0
+    with model_registry.timed("index + chunk store"):
+        snapshot = load_snapshot(use_mmap=use_mmap, mmap_index=mmap_index)
+    if snapshot is None:
         exit(1)
+    swap_snapshot(snapshot)
+    del snapshot  # only `active` may keep it alive, so a swap can free it
+    if args.reload_interval > 0:
+        # generate_embeddings publishes snapshots; new ones are swapped in without a restart
+        watch_snapshots(args.reload_interval, use_mmap=use_mmap, mmap_index=mmap_index)
+
+    if args.workers > 0:
+        with model_registry.timed("retrieval workers"):
+            worker_pool = start_workers(args)
+    elif args.warmup:
+        def warm_model():
+            if embed_client is None:
+                get_model()
+            if reranker.enabled:
+                reranker.load()
+            if args.profile_startup:
+                # second report, now including the background model load
+                print(model_registry.startup_report())
+        model_registry.warm_up(warm_model)
 
     print("✅ Ready! Launching Gradio UI...")
 
@@ -182,20 +730,29 @@ if __name__ == "__main__":
         msg = gr.Textbox(label="Ask about your documents...")
         clear = gr.Button("Clear chat")
 
-        def respond(message, chat_history):
+        async def respond(message, chat_history):
             if not message.strip():
-                return "", chat_history
-            # print each user message entering the system
-            print(f"[{datetime.utcnow().isoformat()}] User submitted message: {message!r}")
-            bot_msg = chat(message, chat_history, index, total_chunks)
+                yield "", chat_history
+                return
+            tracing.log(logging.DEBUG, "user_message", message=message)
+            bot_msg = ""
             chat_history.append((message, bot_msg))
-            # print after getting the bot response
-            print(f"[{datetime.utcnow().isoformat()}] Appended bot response to history. (response chars={len(bot_msg)})")
-            return "", chat_history
+            # re-render the last turn as each chunk of the answer arrives
+            # the snapshot current now serves this whole request, even if a newer one is swapped in
+            async for bot_msg in chat_async(message, chat_history, active):
+                if isinstance(bot_msg, list):
+                    # final [(paragraph, grounding score)]: colour each paragraph
+                    bot_msg = grounding.render_scored_answer(bot_msg)
+                chat_history[-1] = (message, bot_msg)
+                yield "", chat_history
 
         msg.submit(respond, [msg, chatbot], [msg, chatbot])
         clear.click(lambda: [], None, chatbot, queue=False)
 
+    demo.queue(default_concurrency_limit=args.concurrency, max_size=args.queue_size)
+    if args.profile_startup:
+        model_registry.record("until UI launch", time.perf_counter() - _IMPORT_START)
+        print(model_registry.startup_report())
     demo.launch()
     demo.launch(share=True)
 
@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import numpy as np
+import model_registry
+import tracing
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+DEFAULT_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"   # ~22M params, fine on CPU
+DEFAULT_CANDIDATES = 50     # retrieved cheaply, then reranked
+DEFAULT_BUDGET_MS = 150.0   # per query; past this the retrieval order is kept
+MAX_PAIR_TOKENS = 256       # query + chunk, truncated
+BATCH_SIZE = 16             # pairs per forward pass; the deadline is checked between batches
+WORKERS = 2
+
+
+class Reranker:
+    """Reorder retrieved chunks with a cross-encoder, within a hard latency budget.
+
+    rerank() returns None instead of an order when the budget runs out (queue
+    backed up, slow batch) so the caller keeps its own ranking; work that
+    overruns is abandoned at the next batch boundary. Until the model is loaded
+    (on a background thread, started by the first query) no work is queued and
+    rerank() returns None; if loading or scoring fails, reranking switches off.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, candidates=DEFAULT_CANDIDATES,
+                 budget_ms=DEFAULT_BUDGET_MS, device="cpu"):
+        self.model_name = model_name
+        self.candidates = candidates
+        self.budget_ms = budget_ms
+        self.device = device
+        self._pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="rerank")
+        self._failed = None
+        self._loader = None
+        self._lock = threading.Lock()
+        self.reranked = 0
+        self.timeouts = 0
+        self.not_ready = 0
+
+    @property
+    def enabled(self):
+        return self.candidates > 0 and self._failed is None
+
+    def load(self):
+        """(tokenizer, model), loaded by the first query (or the bot's --warmup)."""
+        try:
+            return model_registry.get_cross_encoder(self.model_name, self.device)
+        except Exception as e:
+            self._disable(e)  # e.g. the model can't be downloaded: stop trying on every query
+            raise
+
+    def is_loaded(self):
+        return model_registry.is_loaded(model_registry.cross_encoder_key(self.model_name, self.device))
+
+    def _disable(self, error):
+        with self._lock:
+            if self._failed is not None:
+                return
+            self._failed = repr(error)
+        tracing.log(logging.ERROR, "rerank_disabled", error=repr(error), model=self.model_name)
+
+    def _start_loading(self):
+        """Load the model once on a daemon thread (hub retries can take a long time)."""
+        with self._lock:
+            if self._loader is not None:
+                return
+
+            def load_quietly():
+                try:
+                    self.load()
+                except Exception:
+                    pass  # recorded by load()
+            self._loader = model_registry.warm_up(load_quietly)
+
+    def _record_failure(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            self._disable(future.exception())
+
+    def _score(self, query, texts, deadline):
+        """Relevance logits for (query, text) pairs, or None once past ``deadline``."""
+        import torch
+        if time.perf_counter() > deadline:
+            return None  # abandoned while queued
+        tokenizer, model = self.load()
+        scores = []
+        with torch.no_grad():
+            for start in range(0, len(texts), BATCH_SIZE):
+                if time.perf_counter() > deadline:
+                    return None
+                batch = texts[start:start + BATCH_SIZE]
+                inputs = tokenizer([query] * len(batch), batch, return_tensors="pt", truncation=True,
+                                   max_length=MAX_PAIR_TOKENS, padding=True)
+                logits = model(**inputs).logits
+                # single-logit relevance heads (ms-marco) or [irrelevant, relevant]
+                scores.append((logits[:, -1] if logits.shape[-1] > 1 else logits[:, 0]).numpy())
+        return np.concatenate(scores) if scores else np.zeros(0, dtype="float32")
+
+    def rerank(self, query, texts):
+        """Positions of ``texts`` best first, or None (budget exceeded / reranker unavailable)."""
+        if not self.enabled or not texts:
+            return None
+        if not self.is_loaded():
+            self._start_loading()
+            with self._lock:
+                self.not_ready += 1
+            return None
+        deadline = time.perf_counter() + self.budget_ms / 1000.0
+        future = self._pool.submit(self._score, query, list(texts), deadline)
+        # failures are recorded even when they arrive after this query gave up
+        future.add_done_callback(self._record_failure)
+        try:
+            scores = future.result(timeout=max(0.0, deadline - time.perf_counter()))
+        except TimeoutError:
+            scores = None
+        except Exception:
+            return None
+
+        with self._lock:
+            if scores is None:
+                self.timeouts += 1
+            else:
+                self.reranked += 1
+        if scores is None:
+            return None
+        return list(np.argsort(-scores, kind="stable"))
+
+    def stats(self):
+        total = self.reranked + self.timeouts
+        return {
+            "reranked": self.reranked,
+            "timeouts": self.timeouts,
+            "timeout_rate": self.timeouts / total if total else 0.0,
+            "not_ready": self.not_ready,
+            "enabled": int(self.enabled),
+        }
@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+# generate_embeddings writes its working files into embeddings/, then publishes
+# them as an immutable snapshot: embeddings/snapshots/v<N>/ holding hard links
+# to those files. Every writer replaces files by rename, never in place, so a
+# link keeps the published content even after the next ingestion run.
+# embeddings/snapshots/CURRENT names the snapshot servers should load.
+EMB_DIR = Path("embeddings")
+SNAPSHOT_DIR = "snapshots"
+CURRENT_NAME = "CURRENT"
+INFO_NAME = "snapshot.json"
+KEEP_SNAPSHOTS = 3         # older ones are deleted on publish (servers may still have them mapped)
+
+SNAPSHOT_FILES = (
+    "faiss_index.bin",
+    "index_config.json",
+    "embeddings.f32",
+    "embeddings_meta.json",
+    "chunks.bin",
+    "chunks_meta.json",
+    "bm25.npz",
+    "manifest.json",
+)
+
+
+def snapshots_root(emb_dir=EMB_DIR):
+    return Path(emb_dir) / SNAPSHOT_DIR
+
+
+def current_version(emb_dir=EMB_DIR):
+    """Name of the published snapshot (e.g. "v12"), or None before the first publish."""
+    try:
+        return (snapshots_root(emb_dir) / CURRENT_NAME).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def snapshot_dir(version, emb_dir=EMB_DIR):
+    return snapshots_root(emb_dir) / version
+
+
+def list_versions(emb_dir=EMB_DIR):
+    """Published snapshot names, oldest first."""
+    root = snapshots_root(emb_dir)
+    if not root.exists():
+        return []
+    versions = [p.name for p in root.iterdir() if p.is_dir() and p.name[1:].isdigit()]
+    return sorted(versions, key=lambda v: int(v[1:]))
+
+
+def _file_signature(path):
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)  # e.g. a filesystem without hard links
+
+
+# ---------------------------------------------------------------------
+# Publish (ingestion side)
+# ---------------------------------------------------------------------
+def publish(emb_dir=EMB_DIR, keep=KEEP_SNAPSHOTS):
+    """Snapshot the working index files and point CURRENT at it; returns the version.
+
+    Nothing is published when the files are unchanged since the current snapshot.
+    """
+    emb_dir = Path(emb_dir)
+    files = {name: _file_signature(emb_dir / name) for name in SNAPSHOT_FILES if (emb_dir / name).exists()}
+    current = current_version(emb_dir)
+    if current is not None:
+        info_path = snapshot_dir(current, emb_dir) / INFO_NAME
+        if info_path.exists() and json.loads(info_path.read_text(encoding="utf-8"))["files"] == files:
+            return current
+
+    versions = list_versions(emb_dir)
+    version = f"v{int(versions[-1][1:]) + 1 if versions else 1}"
+    target = snapshot_dir(version, emb_dir)
+    staging = target.with_name(f".{version}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    for name in files:
+        _link_or_copy(emb_dir / name, staging / name)
+    info = {"version": version, "created": time.time(), "files": files}
+    (staging / INFO_NAME).write_text(json.dumps(info, indent=2), encoding="utf-8")
+    staging.rename(target)
+
+    pointer = snapshots_root(emb_dir) / CURRENT_NAME
+    tmp_pointer = pointer.with_name(CURRENT_NAME + ".tmp")
+    tmp_pointer.write_text(version, encoding="utf-8")
+    tmp_pointer.replace(pointer)
+    print(f"📦 Published index snapshot {version} → {target}")
+
+    for old in list_versions(emb_dir)[:-keep]:
+        # mapped files stay readable until servers let go of them (POSIX unlink semantics)
+        shutil.rmtree(snapshot_dir(old, emb_dir), ignore_errors=True)
+    return version
+
+
+if __name__ == "__main__":
+    publish()
@@ -0,0 +1,303 @@
+import atexit
+import bisect
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ---------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------
+# Latency histogram bucket upper bounds (ms); the last bucket is +inf
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+logger = logging.getLogger("rag")
+_sample_rate = 1.0
+_listener = None
+
+
+# ---------------------------------------------------------------------
+# Structured logging (JSON lines, written off the request path)
+# ---------------------------------------------------------------------
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "event": record.getMessage(),
+        }
+        payload.update(getattr(record, "fields", {}))
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+def configure(level="INFO", sample_rate=1.0, stream=None):
+    """Send JSON log records through a queue so stdout writes happen on a background thread.
+
+    ``sample_rate`` is the fraction of successful request traces that get logged;
+    warnings, errors and failed traces are always logged.
+    """
+    global _listener, _sample_rate
+    _sample_rate = sample_rate
+
+    if _listener is not None:
+        _listener.stop()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    sink = logging.StreamHandler(stream or sys.stdout)
+    sink.setFormatter(JsonFormatter())
+    records = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, sink)
+    _listener.start()
+
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+atexit.register(_stop_listener)
+
+
+def log(level, event, **fields):
+    """log(logging.WARNING, "index_missing", path=...) - tagged with the current trace id."""
+    if not logger.isEnabledFor(level):
+        return
+    trace = _current.get()
+    if trace is not None:
+        fields.setdefault("trace_id", trace.trace_id)
+    logger.log(level, event, extra={"fields": fields})
+
+
+# ---------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------
+class Histogram:
+    """Fixed-bucket latency histogram; quantiles are interpolated within a bucket."""
+
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, ms):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+            self.count += 1
+            self.total += ms
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lo = self.buckets[i - 1] if i > 0 else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return float(self.buckets[-1])
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "count": self.count,
+                "mean_ms": self.total / self.count if self.count else 0.0,
+                "p50_ms": self.quantile(0.50),
+                "p95_ms": self.quantile(0.95),
+                "p99_ms": self.quantile(0.99),
+            }
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+_counters = {}
+_stat_providers = {}
+
+
+def observe(name, ms):
+    hist = _histograms.get(name)
+    if hist is None:
+        with _histograms_lock:
+            hist = _histograms.setdefault(name, Histogram())
+    hist.observe(ms)
+
+
+def incr(name, value=1):
+    with _histograms_lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def register_stats(name, provider):
+    """Expose ``provider()`` (a dict of numbers, e.g. cache.stats) under ``name``."""
+    _stat_providers[name] = provider
+
+
+def metrics():
+    """{"latency": {stage: {count, mean/p50/p95/p99 ms}}, "counters": {...}, "stats": {...}}"""
+    with _histograms_lock:
+        hists = dict(_histograms)
+        counters = dict(_counters)
+    return {
+        "latency": {name: h.snapshot() for name, h in sorted(hists.items())},
+        "counters": counters,
+        "stats": {name: provider() for name, provider in _stat_providers.items()},
+    }
+
+
+def prometheus_text():
+    lines = []
+    with _histograms_lock:
+        hists = dict(_histograms)
+        counters = dict(_counters)
+    for name, h in sorted(hists.items()):
+        metric = "rag_" + name.replace(".", "_") + "_ms"
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for le, c in zip(list(h.buckets) + ["+Inf"], h.counts):
+            cumulative += c
+            lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+        lines.append(f"{metric}_sum {h.total}")
+        lines.append(f"{metric}_count {h.count}")
+    for name, value in sorted(counters.items()):
+        metric = "rag_" + name.replace(".", "_") + "_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    for name, provider in sorted(_stat_providers.items()):
+        for key, value in provider().items():
+            metric = f"rag_{name}_{key}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, ctype = prometheus_text().encode("utf-8"), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, ctype = json.dumps(metrics(), indent=2).encode("utf-8"), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # scrapes would otherwise print a line each
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+# ---------------------------------------------------------------------
+# Traces + spans
+# ---------------------------------------------------------------------
+_current = contextvars.ContextVar("rag_trace", default=None)
+
+
+class Trace:
+    """Per-request record of stage timings, emitted as one JSON log line by finish()."""
+
+    def __init__(self, name, **fields):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.fields = fields
+        self.spans = {}
+        self.sampled = random.random() < _sample_rate
+        self._start = time.perf_counter()
+        self._finished = False
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000.0)
+
+    def record(self, name, ms):
+        observe(name, ms)
+        self.spans[name] = round(self.spans.get(name, 0.0) + ms, 3)
+
+    def annotate(self, **fields):
+        self.fields.update(fields)
+
+    def finish(self, error=None):
+        if self._finished:
+            return
+        self._finished = True
+        total_ms = (time.perf_counter() - self._start) * 1000.0
+        observe(f"{self.name}.total", total_ms)
+        incr(f"{self.name}.errors" if error else f"{self.name}.ok")
+        if error is None and not self.sampled:
+            return
+        level = logging.ERROR if error else logging.INFO
+        if logger.isEnabledFor(level):
+            record = dict(self.fields, trace_id=self.trace_id, total_ms=round(total_ms, 3), spans=self.spans)
+            if error is not None:
+                record["error"] = repr(error)
+            logger.log(level, self.name, extra={"fields": record})
+
+
+@contextmanager
+def activate(trace):
+    """Make ``trace`` current for span() calls in this thread / task (sync code only)."""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name):
+    """Time a stage into the current trace (if any) and the global histograms."""
+    trace = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - start) * 1000.0
+        if trace is not None:
+            trace.record(name, ms)
+        else:
+            observe(name, ms)
+
+
+def annotate(**fields):
+    trace = _current.get()
+    if trace is not None:
+        trace.annotate(**fields)
+
+
+def run_in_trace(trace, fn, *args):
+    """fn(*args) with ``trace`` active - for work handed to a thread pool."""
+    with activate(trace):
+        return fn(*args)
+
+
+configure()
@@ -1,14 +1,21 @@
+import sys
 import numpy as np
-import pandas as pd
 from pathlib import Path
 # ...existing code...
 # from sentence_transformers import SentenceTransformer
-from transformers import AutoTokenizer, AutoModel
 import torch
 
 EMB_DIR = Path("embeddings")
 # ...existing code...
 
+# share the embedding store reader with the backend
+sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
+from embedding_store import EmbeddingStore
+from query_cache import EmbeddingCache
+import model_registry
+import embed_backend
+from embed_client import client_for
+
 # ---------------------------------------------------------------------
 # Configuration for ModernBERT
 # ---------------------------------------------------------------------
@@ -17,22 +24,26 @@ CHUNKS_DIR = Path("chunks")
 MODEL_NAME = "answerdotai/ModernBERT-base"
 CHUNK_SIZE = 512
 DEVICE = "cpu"
+EMBED_BACKEND = embed_backend.DEFAULT_BACKEND  # set EMBED_BACKEND=onnx etc. in the environment
+EMBED_CLIENT = client_for(None)  # set EMBED_SERVER=http://127.0.0.1:8765 to share embed_server.py's model
 
 def load_model():
-    print("📌 Loading ModernBERT model (CPU)...")
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-    model = AutoModel.from_pretrained(MODEL_NAME).to(DEVICE)
-    model.eval()
-    return tokenizer, model
+    """(tokenizer, model), loaded on first use and shared with the backend via model_registry."""
+    return model_registry.get_model(MODEL_NAME, DEVICE, EMBED_BACKEND)
 
-# load once at module import (CPU)
-_tokenizer, _bert_model = load_model()
+_embed_cache = EmbeddingCache(fingerprint=embed_backend.cache_fingerprint(MODEL_NAME, EMBED_BACKEND))
 
 def embed_text(text: str) -> np.ndarray:
     """
     Embed a short text using ModernBERT on CPU.
-    Returns a 1-D float32 numpy array (L2-normalized).
+    Returns a 1-D float32 numpy array (L2-normalized), cached per normalized text.
     """
+    return _embed_cache.get_or_compute(text, _embed_text_uncached)
+
+def _embed_text_uncached(text: str) -> np.ndarray:
+    if EMBED_CLIENT is not None:
+        return EMBED_CLIENT.embed(MODEL_NAME, [text], backend=EMBED_BACKEND)[0]
+    _tokenizer, _bert_model = load_model()
     tokens = _tokenizer(text, return_tensors="pt", truncation=True, padding=True).to(DEVICE)
     with torch.no_grad():
         outputs = _bert_model(**tokens)
@@ -51,6 +62,46 @@ def cosine_sim(a: np.ndarray, b: np.ndarray) -> float:
         return 0.0
     return float(np.dot(a, b) / denom)
 
+def embed_texts(texts) -> np.ndarray:
+    """
+    Embed many texts with one padded ModernBERT forward pass.
+    Returns a (len(texts), dim) float32 matrix of L2-normalized rows; texts
+    already in the embedding cache are not re-embedded.
+    """
+    rows = [_embed_cache.get(t) for t in texts]
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if not rows:
+        dim = 0 if EMBED_CLIENT is not None else load_model()[1].config.hidden_size
+        return np.zeros((0, dim), dtype="float32")
+    if missing and EMBED_CLIENT is not None:
+        fresh = EMBED_CLIENT.embed(MODEL_NAME, [texts[i] for i in missing], backend=EMBED_BACKEND)
+        for i, vec in zip(missing, fresh):
+            rows[i] = _embed_cache.put(texts[i], vec)
+    elif missing:
+        _tokenizer, _bert_model = load_model()
+        tokens = _tokenizer([texts[i] for i in missing], return_tensors="pt",
+                            truncation=True, padding=True).to(DEVICE)
+        with torch.no_grad():
+            outputs = _bert_model(**tokens)
+            # mean over real tokens only, so padding doesn't change a text's vector
+            mask = tokens["attention_mask"].unsqueeze(-1).to(outputs.last_hidden_state.dtype)
+            pooled = (outputs.last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1)
+            pooled = pooled / pooled.norm(dim=1, keepdim=True)
+        for i, vec in zip(missing, pooled.cpu().numpy().astype("float32")):
+            rows[i] = _embed_cache.put(texts[i], vec)
+    return np.stack(rows)
+
+_reference_embed = None
+
+def reference_embedding() -> np.ndarray:
+    """Mean of the two nhsdoc2 chunk embeddings, L2-normalized; read from the store once."""
+    global _reference_embed
+    if _reference_embed is None:
+        store = EmbeddingStore.open(EMB_DIR)
+        doc_embed = (store.vector("nhsdoc2_0").astype('float32') + store.vector("nhsdoc2_1").astype('float32')) / 2.0
+        _reference_embed = doc_embed / np.linalg.norm(doc_embed)
+    return _reference_embed
+
 def similarity(response):
     resp = response
     print('SIMILARITY FUNCTION OUTPUT:')
@@ -58,20 +109,16 @@ def similarity(response):
     print(type(resp))
     # embedding_matrix = pd.read_pickle(EMB_DIR / "all_embeddings.pkl")
     # doc_embed = embedding_matrix.iloc[embed_ind].values[embed_ind]
-    # Load two doc embeddings and take their mean
-    docs_dir = Path("embeddings")
-    doc0 = np.load(docs_dir / "nhsdoc2_0.npy")
-    doc1 = np.load(docs_dir / "nhsdoc2_1.npy")
-    doc_embed = ((doc0.astype('float32') + doc1.astype('float32')) / 2.0).astype('float32')
-
-    print(doc_embed.shape)
-    # iterate over items in resp (expecting iterable of (text, something))
-    for text_item in resp:
-        # embed the short text using ModernBERT helper (returns 1-D numpy array)
-        resp_embed = embed_text(text_item)
-        sim = cosine_sim(resp_embed, doc_embed)
+    paragraphs = list(resp)
+    if not paragraphs:
+        return resp
+
+    # one batched forward pass, then every cosine similarity as a single mat-vec
+    # (both sides are already unit length)
+    sims = embed_texts(paragraphs) @ reference_embedding()
+    for text_item, sim in zip(paragraphs, sims):
         # store similarity back keyed by the original text
-        resp[text_item] = sim
+        resp[text_item] = float(sim)
 
     return resp
 
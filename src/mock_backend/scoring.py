@@ -1,12 +1,13 @@
 import numpy as np
-import pandas as pd
-from mock import chatbot_response
+from mock import chatbot_response, reference_embedding
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
+import model_registry  # importable once mock has put src/backend on sys.path
+from embed_client import client_for
 
 
 EMB_DIR = Path("embeddings")
-model = SentenceTransformer("all-MiniLM-L6-v2")
+SCORING_MODEL = "all-MiniLM-L6-v2"  # loaded on first similarity() call
+EMBED_CLIENT = client_for(None)     # $EMBED_SERVER set: encode through embed_server.py instead
 
 def cosine_sim(a: np.ndarray, b: np.ndarray) -> float:
     """Cosine similarity between two 1-D numpy arrays. Returns float in [-1, 1]."""
@@ -23,15 +24,16 @@ def similarity(response):
     resp, embed_ind = response
     # embedding_matrix = pd.read_pickle(EMB_DIR / "all_embeddings.pkl")
     # doc_embed = embedding_matrix.iloc[embed_ind].values[embed_ind]
-    # Load two doc embeddings and take their mean
-    docs_dir = Path("embeddings")
-    doc0 = np.load(docs_dir / "nhsdoc2_0.npy")
-    doc1 = np.load(docs_dir / "nhsdoc2_1.npy")
-    doc_embed = ((doc0.astype('float32') + doc1.astype('float32')) / 2.0).astype('float32')
+    # Mean of two doc embeddings, read from the store once (shared with mock.similarity)
+    doc_embed = reference_embedding()
 
     print(doc_embed.shape)
+    model = model_registry.get_sentence_transformer(SCORING_MODEL) if EMBED_CLIENT is None else None
     for response, _ in resp:
-        resp_embed = model.encode([response], convert_to_numpy=True, normalize_embeddings=True).astype('float32')
+        if EMBED_CLIENT is not None:
+            resp_embed = EMBED_CLIENT.embed(SCORING_MODEL, [response], kind="st")
+        else:
+            resp_embed = model.encode([response], convert_to_numpy=True, normalize_embeddings=True).astype('float32')
         sim = cosine_sim(resp_embed,doc_embed)
         resp[response] = sim 
 
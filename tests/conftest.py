@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src" / "backend"))
+
+DOCS_DIR = ROOT / "docs"
+
+
+@pytest.fixture(scope="session")
+def corpus():
+    """Text of the documents shipped in docs/."""
+    return [p.read_text(encoding="utf-8") for p in sorted(DOCS_DIR.glob("*.txt"))]
+
+
+@pytest.fixture(scope="session")
+def document(corpus):
+    """The longest document, long enough to need several chunks."""
+    return max(corpus, key=len)
+
+
+@pytest.fixture(scope="session")
+def tokenizer(corpus):
+    """Small byte-level BPE fast tokenizer with ModernBERT's special tokens, trained on docs/."""
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, processors, trainers
+    from transformers import PreTrainedTokenizerFast
+
+    specials = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    bpe = Tokenizer(models.BPE(unk_token="[UNK]"))
+    bpe.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    bpe.decoder = decoders.ByteLevel()
+    bpe.train_from_iterator(corpus, trainers.BpeTrainer(vocab_size=600, special_tokens=specials,
+                                                        initial_alphabet=pre_tokenizers.ByteLevel.alphabet()))
+    cls_id, sep_id = bpe.token_to_id("[CLS]"), bpe.token_to_id("[SEP]")
+    bpe.post_processor = processors.TemplateProcessing(single="[CLS] $A [SEP]", pair="[CLS] $A [SEP] $B [SEP]",
+                                                       special_tokens=[("[CLS]", cls_id), ("[SEP]", sep_id)])
+    return PreTrainedTokenizerFast(tokenizer_object=bpe, pad_token="[PAD]", unk_token="[UNK]",
+                                   cls_token="[CLS]", sep_token="[SEP]", mask_token="[MASK]",
+                                   model_max_length=8192)
+
+
+@pytest.fixture(scope="session")
+def tiny_model(tokenizer):
+    """Random-weight two-layer ModernBERT - enough to check pooling and batching arithmetic."""
+    import torch
+    from transformers import ModernBertConfig, ModernBertModel
+
+    torch.manual_seed(0)
+    config = ModernBertConfig(vocab_size=len(tokenizer), hidden_size=32, intermediate_size=64,
+                              num_hidden_layers=2, num_attention_heads=2, max_position_embeddings=8192,
+                              pad_token_id=tokenizer.pad_token_id, cls_token_id=tokenizer.cls_token_id,
+                              sep_token_id=tokenizer.sep_token_id, bos_token_id=tokenizer.cls_token_id,
+                              eos_token_id=tokenizer.sep_token_id, global_attn_every_n_layers=1)
+    return ModernBertModel(config).eval()
@@ -0,0 +1,66 @@
+import numpy as np
+from answer_cache import AnswerCache
+
+
+def unit(*values):
+    v = np.array(values, dtype="float32")
+    return v / np.linalg.norm(v)
+
+
+def test_exact_repeat_hits_regardless_of_case_and_spacing():
+    cache = AnswerCache()
+    cache.store("What is ADHD?", unit(1, 0), [1, 2], "p", "answer")
+    assert cache.lookup("  what is   adhd? ", unit(1, 0), [2, 1], "p") == "answer"
+
+
+def test_no_semantic_match_by_default():
+    cache = AnswerCache()
+    cache.store("What is ADHD?", unit(1, 0), [1, 2], "p", "answer")
+    # nearly identical vectors, different question: the default threshold never reuses it
+    assert cache.lookup("What is autism?", unit(1, 0.01), [1, 2], "p") is None
+
+
+def test_semantic_match_when_enabled():
+    cache = AnswerCache(threshold=0.9)
+    cache.store("What is ADHD?", unit(1, 0), [1, 2], "p", "answer")
+    assert cache.lookup("Tell me about ADHD", unit(1, 0.1), [1, 2], "p") == "answer"
+    assert cache.lookup("Unrelated", unit(0, 1), [1, 2], "p") is None
+
+
+def test_different_context_or_prompt_misses():
+    cache = AnswerCache()
+    cache.store("What is ADHD?", unit(1, 0), [1, 2], "p", "answer")
+    assert cache.lookup("What is ADHD?", unit(1, 0), [1, 3], "p") is None
+    assert cache.lookup("What is ADHD?", unit(1, 0), [1, 2], "other prompt") is None
+
+
+def test_index_version_change_invalidates():
+    cache = AnswerCache()
+    cache.set_index_version("v1")
+    cache.store("q", unit(1, 0), [1], "p", "answer")
+    cache.set_index_version("v1")
+    assert len(cache) == 1
+    cache.set_index_version("v2")
+    assert cache.lookup("q", unit(1, 0), [1], "p") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_expired_entries_and_lru_eviction():
+    cache = AnswerCache(max_entries=2, ttl_seconds=0)
+    cache.store("q", None, [1], "p", "answer")
+    cache._entries[0] = cache._entries[0]._replace(created_at=0.0)
+    assert cache.lookup("q", None, [1], "p") is None
+
+    cache = AnswerCache(max_entries=2)
+    for i in range(3):
+        cache.store(f"q{i}", None, [i], "p", f"a{i}")
+    assert len(cache) == 2
+    assert cache.lookup("q0", None, [0], "p") is None
+    assert cache.lookup("q2", None, [2], "p") == "a2"
+
+
+def test_max_entries_zero_disables():
+    cache = AnswerCache(max_entries=0)
+    cache.store("q", unit(1, 0), [1], "p", "answer")
+    assert len(cache) == 0
+    assert cache.lookup("q", unit(1, 0), [1], "p") is None
@@ -0,0 +1,66 @@
+import pytest
+import chunking
+
+
+def test_chunk_text_by_sentences_splits_on_sentence_ends():
+    text = "First one. Second one!  Third one? lower case stays. End"
+    assert chunking.chunk_text_by_sentences(text) == ["First one.", "Second one!", "Third one? lower case stays.", "End"]
+
+
+def test_iter_sentences_matches_whole_text_across_block_boundaries(document):
+    text = document
+    blocks = [text[i:i + 97] for i in range(0, len(text), 97)]
+    assert list(chunking.iter_sentences(blocks)) == chunking.chunk_text_by_sentences(text)
+
+
+def test_sentence_spans_are_trimmed():
+    text = "  Heading\nA sentence here. Another one.  "
+    spans = chunking.sentence_spans(text)
+    assert [text[s:e] for s, e in spans] == ["Heading", "A sentence here.", "Another one."]
+
+
+def test_pack_sentences_respects_budget_and_overlap():
+    sizes = [4, 4, 4, 4, 4]
+    groups = chunking.pack_sentences(sizes, budget=10, overlap=4)
+    assert groups == [(0, 2), (1, 3), (2, 4), (3, 5)]
+    assert all(sum(sizes[a:b]) <= 10 for a, b in groups)
+
+
+def test_pack_sentences_oversized_sentence_comes_back_alone():
+    assert chunking.pack_sentences([3, 50, 3], budget=10, overlap=0) == [(0, 1), (1, 2), (2, 3)]
+
+
+@pytest.mark.parametrize("text", ["", "   \n\t  "])
+def test_chunk_document_empty_text(tokenizer, text):
+    assert chunking.chunk_document(text, tokenizer) == []
+
+
+def test_chunk_document_offsets_and_ids(tokenizer, document):
+    text = document
+    chunks = chunking.chunk_document(text, tokenizer, max_tokens=64, overlap=16)
+    ids = chunking.tokenize_document(text, tokenizer)["input_ids"]
+    assert len(chunks) > 1
+    for c in chunks:
+        assert c.text == text[c.start:c.end]
+        assert len(c.input_ids) <= 64
+        assert c.input_ids == [tokenizer.cls_token_id] + ids[c.token_start:c.token_end] + [tokenizer.sep_token_id]
+    # chunks cover the document's tokens in order, without gaps, and some repeat trailing sentences
+    pairs = list(zip(chunks, chunks[1:]))
+    assert all(prev.token_start < nxt.token_start <= prev.token_end for prev, nxt in pairs)
+    assert any(nxt.token_start < prev.token_end for prev, nxt in pairs)
+
+
+def test_late_chunk_spans_match_chunk_ids(tokenizer, document):
+    text = document
+    chunks, windows, spans = chunking.late_chunk_document(text, tokenizer, max_tokens=64, overlap=16, window=256)
+    assert len(windows) > 1
+    assert [c.text for c in chunks] == [c.text for c in chunking.chunk_document(text, tokenizer, 64, 16)]
+    for c, (w, start, end) in zip(chunks, spans):
+        assert len(windows[w]) <= 256
+        assert windows[w][start:end] == c.input_ids[1:-1]
+
+
+def test_late_windows_rejects_window_smaller_than_a_chunk(tokenizer, document):
+    chunks = chunking.chunk_document(document, tokenizer, max_tokens=64, overlap=0)
+    with pytest.raises(ValueError):
+        chunking.late_windows(1000, chunks, window=16)
@@ -0,0 +1,103 @@
+import shutil
+import faiss
+import numpy as np
+import pytest
+import torch
+import chunking
+import generate_embeddings as ge
+from chunk_store import ChunkStore
+from conftest import DOCS_DIR
+from embedding_store import EmbeddingStore
+
+
+def embed_one(window, model):
+    with torch.no_grad():
+        hidden = model(input_ids=torch.tensor([window])).last_hidden_state[0]
+    return hidden
+
+
+def test_plan_batches_limits_rows_and_padded_tokens():
+    lengths = [5, 100, 40, 100, 7, 60, 3]
+    batches = ge.plan_batches(lengths, batch_size=3, max_batch_tokens=200)
+    assert sorted(i for b in batches for i in b) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) <= 3
+        assert max(lengths[i] for i in batch) * len(batch) <= 200
+
+
+def test_padded_batches_match_single_windows(tokenizer, tiny_model, document):
+    chunks = chunking.chunk_document(document, tokenizer, max_tokens=64, overlap=16)
+    windows = [c.input_ids for c in chunks]
+    assert len({len(w) for w in windows}) > 1  # rows of different lengths get padded
+
+    batched = ge.embed_token_windows(windows, tiny_model, tokenizer.pad_token_id, batch_size=8)
+    for window, row in zip(windows, batched):
+        pooled = embed_one(window, tiny_model).mean(dim=0)
+        np.testing.assert_allclose(row, (pooled / pooled.norm()).numpy(), atol=1e-5)
+    np.testing.assert_allclose(np.linalg.norm(batched, axis=1), 1.0, rtol=1e-5)
+
+
+def test_late_spans_pool_over_their_window(tokenizer, tiny_model, document):
+    _, windows, spans = chunking.late_chunk_document(document, tokenizer, max_tokens=64, overlap=16, window=256)
+    pooled = ge.embed_token_spans(windows, spans, tiny_model, tokenizer.pad_token_id, batch_size=2)
+    hidden = [embed_one(w, tiny_model) for w in windows]
+    for row, (w, start, end) in zip(pooled, spans):
+        expected = hidden[w][start:end].mean(dim=0)
+        np.testing.assert_allclose(row, (expected / expected.norm()).numpy(), atol=1e-5)
+
+
+# ---------------------------------------------------------------------
+# Full rebuild + incremental update
+# ---------------------------------------------------------------------
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """cwd with a docs/ of three documents; ingestion tokenizes in-process."""
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for name in ("nhsdoc1.txt", "nhsdoc2.txt", "nhsdoc3.txt"):
+        shutil.copy(DOCS_DIR / name, docs / name)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ge, "INGEST_WORKERS", 0)
+    monkeypatch.setattr(ge, "CHUNK_SIZE", 64)
+    monkeypatch.setattr(ge, "CHUNK_OVERLAP", 16)
+    return docs
+
+
+def assert_consistent():
+    """Manifest, embedding store, chunk store and FAISS index agree on every id."""
+    manifest = ge.load_manifest()
+    store = EmbeddingStore.open(ge.EMB_DIR)
+    chunks = ChunkStore.open(ge.EMB_DIR)
+    index = faiss.read_index(str(ge.FAISS_PATH))
+
+    by_manifest = {fid: cid for doc in manifest["docs"].values() for cid, fid in zip(doc["chunks"], doc["faiss_ids"])}
+    assert {int(fid): cid for fid, cid in zip(store.faiss_ids, store.chunk_ids)} == by_manifest
+    assert {fid: c.chunk_id for fid, c in chunks.items()} == by_manifest
+    assert sorted(faiss.vector_to_array(index.id_map).tolist()) == sorted(by_manifest)
+    assert manifest["next_id"] > max(by_manifest)
+
+    for fid in store.faiss_ids:
+        np.testing.assert_array_equal(index.reconstruct(int(fid)), store.vectors_for_ids([fid])[0])
+    return store, chunks
+
+
+def test_incremental_update_keeps_ids_consistent(workdir, tokenizer, tiny_model):
+    ge.full_rebuild(tokenizer, tiny_model)
+    store, _ = assert_consistent()
+    before = {cid: store.vector(cid).copy() for cid in store.chunk_ids}
+    old_ids = {doc: entry["faiss_ids"] for doc, entry in ge.load_manifest()["docs"].items()}
+    del store
+
+    (workdir / "nhsdoc1.txt").unlink()
+    (workdir / "nhsdoc2.txt").write_text("A short replacement document. It has two sentences.", encoding="utf-8")
+    shutil.copy(DOCS_DIR / "nhsdoc4.txt", workdir / "nhsdoc4.txt")
+    ge.incremental_update(tokenizer, tiny_model)
+
+    store, chunks = assert_consistent()
+    manifest = ge.load_manifest()
+    assert sorted(manifest["docs"]) == ["nhsdoc2", "nhsdoc3", "nhsdoc4"]
+    assert manifest["docs"]["nhsdoc3"]["faiss_ids"] == old_ids["nhsdoc3"]       # untouched doc keeps its ids
+    assert not set(manifest["docs"]["nhsdoc2"]["faiss_ids"]) & set(old_ids["nhsdoc2"])  # changed doc gets new ones
+    for cid in manifest["docs"]["nhsdoc3"]["chunks"]:
+        np.testing.assert_array_equal(store.vector(cid), before[cid])
+    assert chunks.get(manifest["docs"]["nhsdoc2"]["faiss_ids"][0]).text.startswith("A short replacement")
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+import index_factory
+
+CONFIG = dict(index_factory.DEFAULT_CONFIG, nlist=16, nprobe=16, pq_m=8, ef_search=128)
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((2000, 32)).astype("float32")
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix, np.arange(1000, 3000, dtype="int64")
+
+
+@pytest.mark.parametrize("kind", index_factory.INDEX_KINDS)
+def test_every_kind_finds_its_own_vectors(data, kind):
+    matrix, ids = data
+    index = index_factory.build_index(matrix, ids, dict(CONFIG, kind=kind))
+    assert index.ntotal == len(ids)
+    assert index_factory.supports_ids(index)
+    _, found = index.search(matrix[:50], 1)
+    assert (found[:, 0] == ids[:50]).mean() >= 0.9
+
+
+@pytest.mark.parametrize("kind", index_factory.INDEX_KINDS)
+def test_mmap_load_matches_plain_load(tmp_path, data, kind):
+    matrix, ids = data
+    config = dict(CONFIG, kind=kind)
+    index_factory.save_config(config, tmp_path)
+    index_factory.save_index(index_factory.build_index(matrix, ids, config), tmp_path / "faiss_index.bin")
+
+    plain = index_factory.load_index(tmp_path / "faiss_index.bin", tmp_path)
+    mapped = index_factory.load_index(tmp_path / "faiss_index.bin", tmp_path, mmap=True)
+    assert index_factory.describe(mapped) == index_factory.describe(plain)
+    d_plain, i_plain = plain.search(matrix[:20], 5)
+    d_mapped, i_mapped = mapped.search(matrix[:20], 5)
+    np.testing.assert_array_equal(i_plain, i_mapped)
+    np.testing.assert_allclose(d_plain, d_mapped, rtol=1e-5)
+
+
+def test_search_params_come_from_config_not_the_index_file(tmp_path, data):
+    matrix, ids = data
+    config = dict(CONFIG, kind="ivf")
+    index_factory.save_index(index_factory.build_index(matrix, ids, config), tmp_path / "faiss_index.bin")
+    index_factory.save_config(dict(config, nprobe=3), tmp_path)
+    index = index_factory.load_index(tmp_path / "faiss_index.bin", tmp_path)
+    assert index_factory.base_index(index).nprobe == 3
+
+
+def test_small_corpus_falls_back_to_flat():
+    assert index_factory.effective_kind(dict(CONFIG, kind="ivfpq"), n=50, dim=32) == "flat"
+    with pytest.raises(ValueError):
+        index_factory.effective_kind(dict(CONFIG, kind="lsh"), n=50, dim=32)
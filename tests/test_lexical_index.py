@@ -0,0 +1,54 @@
+import numpy as np
+from lexical_index import BM25Index, looks_like_keywords, reciprocal_rank_fusion, tokenize
+
+TEXTS = [
+    "Sertraline is an antidepressant. The usual sertraline dose is 50mg.",
+    "Co-codamol is a painkiller made from codeine and paracetamol.",
+    "Dyslexia is a common learning difficulty that affects reading.",
+]
+FAISS_IDS = [10, 20, 30]
+
+
+def test_tokenize_drops_stop_words_and_keeps_compounds():
+    assert tokenize("Is Co-codamol safe?") == ["co-codamol", "safe"]
+
+
+def test_search_ranks_matching_chunks_and_skips_the_rest():
+    index = BM25Index.build(TEXTS, FAISS_IDS)
+    scores, ids = index.search("sertraline dose", k=3)
+    assert list(ids) == [10]
+    assert scores[0] > 0
+    _, ids = index.search("codeine reading", k=3)
+    assert sorted(ids) == [20, 30]
+    assert len(index.search("nothing matches", k=3)[1]) == 0
+
+
+def test_search_truncates_to_k():
+    index = BM25Index.build(TEXTS, FAISS_IDS)
+    scores, ids = index.search("sertraline codeine dyslexia", k=2)
+    assert len(ids) == 2
+    assert scores[0] >= scores[1]
+
+
+def test_save_open_round_trip(tmp_path):
+    index = BM25Index.build(TEXTS, FAISS_IDS)
+    index.save(tmp_path)
+    loaded = BM25Index.open(tmp_path)
+    for query in ("sertraline dose", "paracetamol", "reading difficulty"):
+        expected, got = index.search(query, 3), loaded.search(query, 3)
+        np.testing.assert_array_equal(expected[1], got[1])
+        np.testing.assert_allclose(expected[0], got[0])
+
+
+def test_reciprocal_rank_fusion_prefers_ids_ranked_high_in_both():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [2, 3, 1], [2, 1]])
+    assert fused[0] == 2
+    assert set(fused) == {1, 2, 3}
+
+
+def test_looks_like_keywords():
+    index = BM25Index.build(TEXTS, FAISS_IDS)
+    assert looks_like_keywords("sertraline dose", index)
+    assert not looks_like_keywords("what is the sertraline dose", index)
+    assert not looks_like_keywords("sertraline dose?", index)
+    assert not looks_like_keywords("sertraline unknownword", index)
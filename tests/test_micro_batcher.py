@@ -0,0 +1,52 @@
+import threading
+import pytest
+from micro_batcher import MicroBatcher
+
+
+def test_each_caller_gets_its_own_result():
+    batcher = MicroBatcher(lambda items: [x * 2 for x in items], max_batch_size=8, max_wait_ms=20)
+    try:
+        futures = [batcher.submit(i) for i in range(20)]
+        assert [f.result(timeout=5) for f in futures] == [i * 2 for i in range(20)]
+    finally:
+        batcher.close()
+    stats = batcher.stats()
+    assert stats["items"] == 20
+    assert stats["largest_batch"] <= 8
+    assert stats["batches"] < 20
+
+
+def test_concurrent_submits_share_a_batch():
+    sizes = []
+    batcher = MicroBatcher(lambda items: sizes.append(len(items)) or items, max_batch_size=4, max_wait_ms=500)
+    barrier = threading.Barrier(4)
+    results = []
+
+    def call(i):
+        barrier.wait()
+        results.append(batcher.submit(i).result(timeout=5))
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+    assert sorted(results) == [0, 1, 2, 3]
+    assert sizes == [4]
+    assert batcher.stats()["full_batch_rate"] == 1.0
+
+
+def test_exception_reaches_every_caller_in_the_batch():
+    def fail(items):
+        raise RuntimeError("boom")
+
+    batcher = MicroBatcher(fail, max_batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit(i) for i in range(3)]
+    for f in futures:
+        with pytest.raises(RuntimeError, match="boom"):
+            f.result(timeout=5)
+    # the worker survives a failed batch
+    batcher.fn = lambda items: items
+    assert batcher.submit("ok").result(timeout=5) == "ok"
+    batcher.close()
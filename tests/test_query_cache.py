@@ -0,0 +1,56 @@
+import time
+import numpy as np
+from query_cache import EmbeddingCache, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("  Symptoms of   Dyslexia? ") == "symptoms of dyslexia"
+    assert normalize_query("DOSE!!") == "dose"
+
+
+def test_get_or_compute_hits_on_normalized_repeat():
+    cache = EmbeddingCache()
+    calls = []
+    compute = lambda text: calls.append(text) or np.ones(4)
+    first = cache.get_or_compute("What is ADHD?", compute)
+    second = cache.get_or_compute("what is adhd", compute)
+    assert len(calls) == 1
+    assert second is first
+    assert not second.flags.writeable
+    assert cache.stats()["hits"] == 1
+
+
+def test_lru_eviction_under_byte_budget():
+    vec = np.zeros(1024, dtype="float32")  # 4 KiB
+    cache = EmbeddingCache(max_mb=10 / 1024)  # room for two entries
+    cache.put("a", vec)
+    cache.put("b", vec)
+    cache.get("a")            # b is now least recently used
+    cache.put("c", vec)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_miss():
+    cache = EmbeddingCache(ttl_seconds=60)
+    cache.put("old", np.ones(4), created_at=time.time() - 120)
+    assert cache.get("old") is None
+    assert len(cache) == 0
+
+
+def test_save_load_round_trip(tmp_path):
+    path = tmp_path / "cache.npz"
+    cache = EmbeddingCache(path=path, fingerprint="model-a")
+    cache.put("one", np.arange(4, dtype="float32"))
+    cache.save()
+    loaded = EmbeddingCache(path=path, fingerprint="model-a")
+    np.testing.assert_array_equal(loaded.get("one"), np.arange(4, dtype="float32"))
+
+
+def test_load_ignores_cache_of_another_model(tmp_path):
+    path = tmp_path / "cache.npz"
+    cache = EmbeddingCache(path=path, fingerprint="model-a")
+    cache.put("one", np.ones(4))
+    cache.save()
+    assert len(EmbeddingCache(path=path, fingerprint="model-b")) == 0
@@ -0,0 +1,46 @@
+import os
+import snapshots
+
+
+def write(path, text):
+    """Replace a file the way the ingestion scripts do: temp file + rename."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    tmp.replace(path)
+
+
+def test_publish_links_files_and_points_current_at_them(tmp_path):
+    write(tmp_path / "faiss_index.bin", "index v1")
+    write(tmp_path / "chunks.bin", "chunks v1")
+    write(tmp_path / "unrelated.txt", "not snapshotted")
+
+    assert snapshots.current_version(tmp_path) is None
+    version = snapshots.publish(tmp_path)
+    assert version == "v1" == snapshots.current_version(tmp_path)
+    target = snapshots.snapshot_dir(version, tmp_path)
+    assert sorted(p.name for p in target.iterdir()) == ["chunks.bin", "faiss_index.bin", snapshots.INFO_NAME]
+    assert os.path.samefile(target / "faiss_index.bin", tmp_path / "faiss_index.bin")
+
+
+def test_publish_skips_unchanged_files(tmp_path):
+    write(tmp_path / "faiss_index.bin", "index v1")
+    assert snapshots.publish(tmp_path) == "v1"
+    assert snapshots.publish(tmp_path) == "v1"
+    assert snapshots.list_versions(tmp_path) == ["v1"]
+
+
+def test_old_snapshot_keeps_its_contents_after_rewrite(tmp_path):
+    write(tmp_path / "faiss_index.bin", "index v1")
+    snapshots.publish(tmp_path)
+    write(tmp_path / "faiss_index.bin", "index v2, longer")
+    assert snapshots.publish(tmp_path) == "v2"
+    assert (snapshots.snapshot_dir("v1", tmp_path) / "faiss_index.bin").read_text() == "index v1"
+    assert (snapshots.snapshot_dir("v2", tmp_path) / "faiss_index.bin").read_text() == "index v2, longer"
+
+
+def test_publish_prunes_to_keep(tmp_path):
+    for i in range(5):
+        write(tmp_path / "faiss_index.bin", "x" * (i + 1))
+        snapshots.publish(tmp_path, keep=2)
+    assert snapshots.list_versions(tmp_path) == ["v4", "v5"]
+    assert snapshots.current_version(tmp_path) == "v5"
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+import embedding_store
+from chunk_store import ChunkStore, write_chunk_store
+from embedding_store import EmbeddingStore, write_store
+
+
+def test_embedding_store_round_trip(tmp_path):
+    matrix = np.random.default_rng(0).standard_normal((3, 8)).astype("float32")
+    write_store(matrix, ["a#0", "a#1", "b#0"], [5, 7, 9], tmp_path)
+    store = EmbeddingStore.open(tmp_path)
+    assert len(store) == 3 and store.dim == 8
+    assert "a#1" in store and "c#0" not in store
+    np.testing.assert_array_equal(store.vector("b#0"), matrix[2])
+    np.testing.assert_array_equal(store.vectors_for_ids([9, 5]), matrix[[2, 0]])
+    assert store.chunk_id_for(7) == "a#1"
+
+
+def test_write_store_rejects_misaligned_inputs(tmp_path):
+    with pytest.raises(ValueError):
+        write_store(np.zeros((2, 4)), ["a#0"], [1, 2], tmp_path)
+
+
+def test_open_rejects_matrix_that_disagrees_with_sidecar(tmp_path):
+    write_store(np.zeros((3, 4)), ["a", "b", "c"], [1, 2, 3], tmp_path)
+    np.zeros((2, 4), dtype="float32").tofile(tmp_path / embedding_store.MATRIX_NAME)
+    with pytest.raises(ValueError):
+        EmbeddingStore.open(tmp_path)
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_chunk_store_round_trip(tmp_path, use_mmap):
+    texts = ["Plain text.", "Ünïcödé – dashes “quotes”", ""]
+    write_chunk_store([4, 8, 15], ["a#0", "a#1", "b#0"], ["a", "a", "b"], texts, tmp_path)
+    store = ChunkStore.open(tmp_path, use_mmap=use_mmap)
+    assert len(store) == 3 and 8 in store and 16 not in store
+    assert store.get(8) == ("a#1", "a", texts[1])
+    assert store.get(16) is None
+    assert [(fid, c.text) for fid, c in store.items()] == list(zip([4, 8, 15], texts))
+
+
+def test_write_chunk_store_rejects_misaligned_inputs(tmp_path):
+    with pytest.raises(ValueError):
+        write_chunk_store([1, 2], ["a#0"], ["a"], ["text"], tmp_path)